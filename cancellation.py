@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Deadlines y cancelación por request MCP
+Compartido por los servidores: el loop crea un CancelToken por tools/call y el
+código que corre en threads (requests a GitHub/Groq) lo consulta vía contextvar
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+class RequestCancelled(Exception):
+    """El cliente canceló el request o venció su deadline"""
+
+class CancelToken:
+    """Deadline y cancelación de un request, visibles desde el event loop y desde threads"""
+
+    def __init__(self, timeout: float = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason = None
+        self.lock = threading.Lock()
+        self.callbacks: Dict[int, Callable[[], None]] = {}
+        self.ids = itertools.count()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def cancel(self, reason: str = "cancelado por el cliente"):
+        """Marcar el request como cancelado y abortar las operaciones registradas"""
+        with self.lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks = list(self.callbacks.values())
+            self.callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        if self.reason is not None:
+            raise RequestCancelled(self.reason)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise RequestCancelled("deadline excedido")
+
+    def remaining(self) -> Optional[float]:
+        """Segundos hasta el deadline (None si no tiene)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timeout(self, default: float) -> float:
+        """Timeout para una operación: el default acotado por lo que queda del deadline"""
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else max(0.001, min(default, remaining))
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Registrar callback para abortar una operación en vuelo; retorna la función que lo desregistra"""
+        with self.lock:
+            if self.reason is None:
+                key = next(self.ids)
+                self.callbacks[key] = callback
+                return lambda: self.callbacks.pop(key, None)
+        callback()
+        return lambda: None
+
+_current: contextvars.ContextVar = contextvars.ContextVar('mcp_cancel_token', default=None)
+
+def current_token() -> CancelToken:
+    """Token del request en curso; fuera de un request, uno que nunca se cancela"""
+    return _current.get() or CancelToken()
+
+def set_current_token(token: CancelToken):
+    _current.set(token)
+
+def request_timeout(params: Dict[str, Any]) -> Optional[float]:
+    """Deadline del request: MCP_REQUEST_TIMEOUT o uno más corto pedido en _meta.timeoutMs
+
+    ValueError si timeoutMs no es un número positivo.
+    """
+    timeout = float(os.getenv('MCP_REQUEST_TIMEOUT', '120')) or None
+    meta = params.get("_meta") if isinstance(params, dict) else None
+    requested = meta.get("timeoutMs") if isinstance(meta, dict) else None
+    if requested is not None:
+        if isinstance(requested, bool) or not isinstance(requested, (int, float)) or not 0 < requested < float('inf'):
+            raise ValueError("_meta.timeoutMs debe ser un número positivo de milisegundos")
+        requested = requested / 1000
+        timeout = min(timeout, requested) if timeout else requested
+    return timeout
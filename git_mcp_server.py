@@ -5,311 +5,1455 @@ Reemplaza el servidor Git de Node.js
 """
 
 import asyncio
+import base64
+import copy
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import glob
+import hashlib
+import heapq
+import itertools
 import json
+import struct
 import sys
 import os
-import subprocess
-from typing import Dict, Any, List
+import signal
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from dotenv import load_dotenv
+from mcp_runtime import MCPServer, tool
 
 load_dotenv()
 
-class GitMCPServer:
+# Máximo de bytes de un objeto que devuelve git_show
+SHOW_MAX_BYTES = 100_000
+
+# Campos de git_log estructurado: --format separado por NUL, un registro por commit con -z
+LOG_FIELDS = [("sha", "%H"), ("parents", "%P"), ("author", "%an"), ("email", "%ae"),
+              ("date", "%aI"), ("committed", "%cI"), ("subject", "%s")]
+LOG_FORMAT = "%x00".join(code for _, code in LOG_FIELDS)
+
+def _encode_cursor(query: str, **position: int) -> str:
+    """Cursor opaco: una posición (skip, hunk, línea...) atada a la consulta que lo generó"""
+    payload = json.dumps({"q": hashlib.sha1(query.encode()).hexdigest()[:12], **position})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def _decode_cursor(query: str, cursor: str) -> Dict[str, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("cursor inválido")
+    if not isinstance(payload, dict) or payload.pop("q", None) != hashlib.sha1(query.encode()).hexdigest()[:12]:
+        raise ValueError("el cursor no corresponde a esta consulta")
+    return payload
+
+# Límite de la escritura de commit-graph en segundo plano y espera antes de reintentarla si falla
+COMMIT_GRAPH_TIMEOUT = 300
+COMMIT_GRAPH_RETRY = 600
+
+# Caracteres máximos de cada línea que devuelve git_grep
+GREP_LINE_MAX = 500
+
+# Archivos generados que git_diff excluye del resumen (además de linguist-generated y -diff en .gitattributes)
+GENERATED_PATTERNS = [
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "composer.lock", "go.sum", "*.min.js", "*.min.css", "*.map",
+    "*.pb.go", "*_pb2.py", "*.generated.*"
+]
+
+def _is_generated(path: str) -> bool:
+    name = path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_PATTERNS)
+
+def _parse_diff_summary(output: str) -> List[Dict[str, Any]]:
+    """Parsear `git diff --raw --numstat -z`: estado (con renames) y líneas por archivo"""
+    tokens = output.split("\0")
+    raw = []
+    numstat = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith(":"):
+            status = token.split()[4]
+            if status[0] in "RC":
+                raw.append({"path": tokens[i + 2], "old_path": tokens[i + 1], "status": status})
+                i += 3
+            else:
+                raw.append({"path": tokens[i + 1], "status": status})
+                i += 2
+        elif token:
+            added, deleted, path = token.split("\t", 2)
+            numstat.append((added, deleted))
+            i += 3 if path == "" else 1
+        else:
+            i += 1
+    files = []
+    for entry, (added, deleted) in zip(raw, numstat):
+        entry["binary"] = added == "-"
+        entry["added"] = 0 if entry["binary"] else int(added)
+        entry["deleted"] = 0 if entry["binary"] else int(deleted)
+        files.append(entry)
+    return files
+
+def _parse_commit(data: bytes) -> Dict[str, Any]:
+    """Parsear un objeto commit crudo: padres, fecha del committer y subject"""
+    header, _, message = data.partition(b"\n\n")
+    parents = []
+    timestamp = 0
+    for line in header.split(b"\n"):
+        if line.startswith(b"parent "):
+            parents.append(line[7:].decode())
+        elif line.startswith(b"committer "):
+            timestamp = int(line.rsplit(b" ", 2)[1])
+    # Como %s: el primer párrafo del mensaje en una sola línea
+    subject = []
+    for line in message.decode('utf-8', errors='replace').strip("\n").split("\n"):
+        if not line.strip():
+            break
+        subject.append(line.strip())
+    return {"parents": parents, "time": timestamp, "subject": " ".join(subject)}
+
+def _format_tree(data: bytes) -> str:
+    """Listar un objeto tree como `git ls-tree`"""
+    lines = []
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        mode = data[pos:space].decode()
+        sha = data[nul + 1:nul + 21].hex()
+        kind = "tree" if mode == "40000" else "commit" if mode == "160000" else "blob"
+        lines.append(f"{mode.zfill(6)} {kind} {sha}\t{data[space + 1:nul].decode('utf-8', errors='replace')}")
+        pos = nul + 21
+    return "\n".join(lines)
+
+def _parse_status_v2(output: str) -> Dict[str, Any]:
+    """Parsear `git status --porcelain=v2 -z --branch` a un dict estructurado"""
+    status = {"branch": {}, "changed": [], "unmerged": [], "untracked": [], "ignored": []}
+    records = iter(output.split("\0"))
+    for record in records:
+        if record.startswith("# branch."):
+            key, _, value = record[len("# branch."):].partition(" ")
+            if key == "ab":
+                ahead, behind = value.split()
+                status["branch"]["ahead"] = int(ahead)
+                status["branch"]["behind"] = -int(behind)
+            else:
+                status["branch"][key] = value
+        elif record.startswith("1 "):
+            fields = record.split(" ", 8)
+            status["changed"].append({"path": fields[8], "xy": fields[1]})
+        elif record.startswith("2 "):
+            fields = record.split(" ", 9)
+            status["changed"].append({"path": fields[9], "xy": fields[1], "orig_path": next(records), "score": fields[8]})
+        elif record.startswith("u "):
+            fields = record.split(" ", 10)
+            status["unmerged"].append({"path": fields[10], "xy": fields[1]})
+        elif record.startswith("? "):
+            status["untracked"].append(record[2:])
+        elif record.startswith("! "):
+            status["ignored"].append(record[2:])
+    return status
+
+def _kill_group(process: asyncio.subprocess.Process):
+    """SIGKILL a git y a sus hooks, ssh y helpers, que comparten el grupo de procesos y los pipes"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+async def _spawn_git(*args: str, cwd: str, stdin: int = None, stderr: int = asyncio.subprocess.PIPE,
+                     **kwargs) -> asyncio.subprocess.Process:
+    """Lanzar git en su propio grupo de procesos con stdout por pipe
+
+    Si la cancelación llega durante el spawn el proceso igual se crea: se espera y se mata.
+    """
+    spawn = asyncio.ensure_future(asyncio.create_subprocess_exec(
+        'git', *args,
+        cwd=cwd,
+        stdin=stdin,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=stderr,
+        start_new_session=True,
+        **kwargs
+    ))
+    try:
+        return await asyncio.shield(spawn)
+    except asyncio.CancelledError:
+        process = await spawn
+        _kill_group(process)
+        await process.wait()
+        raise
+
+class InotifyWatcher:
+    """Watcher inotify (vía ctypes) del worktree y de .git: cualquier evento llama a on_change
+
+    Solo Linux; si inotify no está disponible o se agotan los watches
+    (fs.inotify.max_user_watches) start() retorna False y el status no se cachea.
+    """
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0x800
+    IN_CLOEXEC = 0x80000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+            IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, worktree: str, git_dirs: List[str], on_change: Callable[[], None]):
+        self.worktree = worktree
+        self.git_dirs = git_dirs
+        self.on_change = on_change
+        self.fd = -1
+        self.watches: Dict[int, Tuple[str, bool, bool]] = {}   # wd -> (directorio, recursivo, dentro de .git)
+        self.loop = None
+        self.libc = None
+        # Los directorios nuevos se registran en un thread: watches y fd se tocan desde ambos lados
+        self.lock = threading.Lock()
+
+    def _add_watch(self, path: str, recursive: bool, in_git: bool = False):
+        with self.lock:
+            if self.fd < 0:
+                return   # watcher cerrado mientras se recorría
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "Límite de inotify watches alcanzado")
+                return   # el directorio desapareció mientras se recorría
+            self.watches[wd] = (path, recursive, in_git)
+
+    def _add_tree(self, root: str, in_git: bool = False):
+        for directory, subdirs, _ in os.walk(root):
+            if not in_git and '.git' in subdirs:
+                subdirs.remove('.git')
+            self._add_watch(directory, True, in_git)
+
+    def start(self) -> bool:
+        """Registrar los watches (bloqueante: correr fuera del event loop)"""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if self.fd < 0:
+                return False
+            self._add_tree(self.worktree)
+            for git_dir in self.git_dirs:
+                # index, HEAD y packed-refs en la raíz; refs/ completo para ahead/behind
+                self._add_watch(git_dir, False, True)
+                self._add_tree(os.path.join(git_dir, 'refs'), in_git=True)
+            return True
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  Watcher de git_status desactivado: {e}", file=sys.stderr)
+            self.close()
+            return False
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        loop.add_reader(self.fd, self._read)
+
+    def _watch_new_tree(self, path: str, in_git: bool):
+        """Registrar un directorio creado y sus subdirectorios sin bloquear el loop (os.walk puede tardar)"""
+        future = self.loop.run_in_executor(None, self._add_tree, path, in_git)
+        future.add_done_callback(self._new_tree_done)
+
+    def _new_tree_done(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is None:
+            return
+        # Sin watches disponibles el cache ya no es confiable: git_status vuelve a correr siempre
+        print(f"⚠️  Watcher de git_status desactivado: {future.exception()}", file=sys.stderr)
+        self.close()
+
+    def _read(self):
+        if self.fd < 0:
+            return
+        changed = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not buffer:
+                break
+            pos = 0
+            while pos < len(buffer):
+                wd, mask, _, length = self.EVENT.unpack_from(buffer, pos)
+                name = buffer[pos + self.EVENT.size:pos + self.EVENT.size + length].rstrip(b"\0")
+                pos += self.EVENT.size + length
+                if mask & self.IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory, recursive, in_git = self.watches.get(wd, (None, False, False))
+                if in_git and name.endswith(b'.lock'):
+                    # Cada `git status` toma y suelta index.lock; solo cuenta el rename final
+                    continue
+                changed = True
+                if recursive and mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO) and name != b'.git':
+                    # Lo que pase en el directorio antes de tener su watch ya queda cubierto por on_change
+                    self._watch_new_tree(os.path.join(directory, os.fsdecode(name)), in_git)
+        if changed:
+            self.on_change()
+
+    def close(self):
+        with self.lock:
+            if self.fd >= 0:
+                if self.loop is not None:
+                    self.loop.remove_reader(self.fd)
+                os.close(self.fd)
+            self.fd = -1
+            self.watches = {}
+
+class GitBackend:
+    """Lecturas de un repositorio sin fork/exec por llamada
+
+    Los objetos salen de un coproceso `git cat-file --batch` de larga vida y las refs
+    se leen directamente de .git. Las escrituras siguen yendo por subprocess.
+    """
+
+    def __init__(self, path: str, git_dir: str, common_dir: str, abbrev: int = 7):
+        self.path = path
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.abbrev = abbrev
+        self.process = None
+        self.lock = asyncio.Lock()
+        # git_status cacheado hasta que el watcher vea un cambio (generation)
+        self.generation = 0
+        self.watcher = None
+        self.status_args = None
+        self.status_cache = None
+        self.status_generation = -1
+        self.status_lock = asyncio.Lock()
+        self.commit_graph_checked = False
+        self.commit_graph_task: Optional[asyncio.Task] = None
+        self.commit_graph_retry_at = 0.0
+        # Desalojado del LRU del servidor: sin watcher ni coproceso persistente
+        self.closed = False
+
+    def _invalidate(self):
+        self.generation += 1
+
+    async def _start_status(self, run: Callable[..., Any]):
+        """Primer git_status: opciones de untracked cache/fsmonitor y arranque del watcher"""
+        args = ["status", "--porcelain=v2", "-z", "--branch"]
+        config = []
+        untracked = await run(["config", "--get", "core.untrackedCache"], cwd=self.path)
+        if not untracked["success"]:
+            config += ["-c", "core.untrackedCache=true"]
+        if sys.platform in ('darwin', 'win32'):
+            # fsmonitor integrado de git solo existe en macOS y Windows
+            fsmonitor = await run(["config", "--get", "core.fsmonitor"], cwd=self.path)
+            if not fsmonitor["success"]:
+                config += ["-c", "core.fsmonitor=true"]
+        self.status_args = config + args
+
+        toplevel = await run(["rev-parse", "--show-toplevel"], cwd=self.path)
+        if os.getenv('GIT_STATUS_WATCH', '1').lower() in ('0', 'false', 'no') or not toplevel["success"]:
+            return
+        if self.closed:
+            return
+        git_dirs = [self.git_dir] if self.git_dir == self.common_dir else [self.git_dir, self.common_dir]
+        watcher = InotifyWatcher(toplevel["stdout"], git_dirs, self._invalidate)
+        if await asyncio.to_thread(watcher.start):
+            if self.closed:
+                # Desalojado mientras arrancaba
+                watcher.close()
+                return
+            watcher.attach(asyncio.get_running_loop())
+            self.watcher = watcher
+
+    async def status(self, run: Callable[..., Any]) -> Dict[str, Any]:
+        """git status estructurado; sin cambios en disco desde la última llamada sale del cache"""
+        async with self.status_lock:
+            if self.status_args is None:
+                await self._start_status(run)
+            watching = self.watcher is not None and self.watcher.fd >= 0
+            if watching and self.status_cache is not None and self.status_generation == self.generation:
+                return {**self.status_cache, "cached": True}
+
+            generation = self.generation
+            result = await run(self.status_args, cwd=self.path)
+            if not result["success"]:
+                return {"error": result.get("stderr") or result.get("error", "Error ejecutando git status")}
+            status = _parse_status_v2(result["stdout"])
+            # Si hubo eventos durante la corrida (p.ej. git reescribiendo el index) no se cachea
+            if watching and generation == self.generation:
+                self.status_cache = status
+                self.status_generation = generation
+            return {**status, "cached": False}
+
+    async def _exchange(self, rev: str) -> Optional[Tuple[str, str, bytes]]:
+        if self.process is None or self.process.returncode is not None:
+            self.process = await _spawn_git('cat-file', '--batch', cwd=self.path,
+                                            stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        self.process.stdin.write(rev.encode() + b"\n")
+        await self.process.stdin.drain()
+        header = await self.process.stdout.readline()
+        if not header:
+            raise ConnectionError("git cat-file terminó inesperadamente")
+        if header.endswith((b" missing\n", b" ambiguous\n")):
+            return None
+        sha, kind, size = header.decode().split()
+        data = await self.process.stdout.readexactly(int(size) + 1)
+        return sha, kind, data[:-1]
+
+    async def read_object(self, rev: str) -> Optional[Tuple[str, str, bytes]]:
+        """(sha, tipo, contenido) de una revisión (`HEAD`, `abc123`, `HEAD~2:archivo`) o None si no existe"""
+        if "\n" in rev:
+            return None
+        async with self.lock:
+            try:
+                for attempt in range(2):
+                    try:
+                        return await asyncio.wait_for(self._exchange(rev), timeout=30)
+                    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                        # Coproceso caído o colgado: se reinicia y se reintenta una vez
+                        await self._stop_process()
+                        if attempt:
+                            raise
+                    except asyncio.CancelledError:
+                        # Request cancelado a mitad de una respuesta: el protocolo quedó desfasado
+                        await self._stop_process()
+                        raise
+            finally:
+                if self.closed:
+                    # Llamada que seguía en curso al desalojarlo: no dejar un coproceso huérfano
+                    await self._stop_process()
+
+    def _read_refs(self) -> Dict[str, str]:
+        """refname -> sha o `ref: destino`, combinando packed-refs con las refs sueltas"""
+        refs = {}
+        try:
+            with open(os.path.join(self.common_dir, 'packed-refs')) as packed:
+                for line in packed:
+                    if line.startswith(('#', '^')):
+                        continue
+                    sha, _, name = line.strip().partition(' ')
+                    refs[name] = sha
+        except FileNotFoundError:
+            pass
+        for namespace in ('heads', 'remotes'):
+            root = os.path.join(self.common_dir, 'refs', namespace)
+            for directory, _, files in os.walk(root):
+                for filename in files:
+                    if filename.endswith('.lock'):
+                        # Ref a medio actualizar por un fetch/commit concurrente: no es una rama
+                        continue
+                    full = os.path.join(directory, filename)
+                    name = os.path.relpath(full, self.common_dir).replace(os.sep, '/')
+                    try:
+                        with open(full) as ref:
+                            refs[name] = ref.read().strip()
+                    except FileNotFoundError:
+                        # Borrada entre el listado y la lectura (branch -d, pack-refs)
+                        continue
+        return refs
+
+    def branch_list(self) -> Optional[str]:
+        """Salida de `git branch -a`; None si el caso requiere git (detached, worktrees, reftable)"""
+        if any(os.path.exists(os.path.join(self.common_dir, name)) for name in ('reftable', 'worktrees')):
+            return None
+        with open(os.path.join(self.git_dir, 'HEAD')) as head_file:
+            head = head_file.read().strip()
+        if not head.startswith('ref: '):
+            return None
+        current = head[5:]
+
+        refs = self._read_refs()
+        lines = []
+        for name in sorted(refs):
+            if name.startswith('refs/heads/'):
+                marker = "* " if name == current else "  "
+                lines.append(f"{marker}{name[len('refs/heads/'):]}")
+            elif name.startswith('refs/remotes/'):
+                line = f"  remotes/{name[len('refs/remotes/'):]}"
+                if refs[name].startswith('ref: '):
+                    line += f" -> {refs[name][5:].replace('refs/remotes/', '', 1)}"
+                lines.append(line)
+        return "\n".join(lines)
+
+    async def log_oneline(self, limit: int) -> Optional[List[str]]:
+        """Salida de `git log -N --oneline` recorriendo commits por fecha; None si HEAD no es un commit"""
+        head = await self.read_object("HEAD")
+        if head is None or head[1] != "commit":
+            return None
+        counter = itertools.count()
+        commit = _parse_commit(head[2])
+        queue = [(-commit["time"], next(counter), head[0], commit)]
+        seen = {head[0]}
+        lines = []
+        while queue and len(lines) < limit:
+            _, _, sha, commit = heapq.heappop(queue)
+            lines.append(f"{sha[:self.abbrev]} {commit['subject']}")
+            for parent in commit["parents"]:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                obj = await self.read_object(parent)
+                if obj is None:
+                    continue   # repositorio shallow
+                parent_commit = _parse_commit(obj[2])
+                heapq.heappush(queue, (-parent_commit["time"], next(counter), parent, parent_commit))
+        return lines
+
+    async def _stop_process(self):
+        """Terminar el coproceso cat-file (el próximo read_object arranca uno nuevo); el watcher sigue"""
+        if self.process is not None and self.process.returncode is None:
+            _kill_group(self.process)
+            await self.process.wait()
+        self.process = None
+
+    async def release(self):
+        """Soltar el watcher y el coproceso; las llamadas en curso terminan con procesos de una sola lectura
+
+        Una escritura de commit-graph en curso sigue hasta terminar (o su timeout).
+        """
+        self.closed = True
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        async with self.lock:
+            await self._stop_process()
+
+    async def aclose(self):
+        if self.commit_graph_task is not None:
+            self.commit_graph_task.cancel()
+            await asyncio.gather(self.commit_graph_task, return_exceptions=True)
+        await self.release()
+
+class GitMCPServer(MCPServer):
+    name = "git-python-mcp-server"
+
     def __init__(self):
+        super().__init__()
         self.base_path = os.getcwd()
-        
-    def _run_git_command(self, command: List[str], cwd: str = None) -> Dict[str, Any]:
-        """Ejecutar comando git y retornar resultado"""
+        # Backend persistente para lecturas (GIT_PERSISTENT_BACKEND=0 vuelve a un proceso por llamada)
+        self.persistent = os.getenv('GIT_PERSISTENT_BACKEND', '1').lower() not in ('0', 'false', 'no')
+        # LRU: cada backend tiene un coproceso cat-file y una instancia de inotify (fs.inotify.max_user_instances)
+        self.backends: "OrderedDict[str, GitBackend]" = OrderedDict()
+        self.max_backends = max(1, int(os.getenv('GIT_MAX_BACKENDS', '32')))
+        # Repositorios procesados a la vez cuando `repo` es un glob
+        self.max_workers = int(os.getenv('GIT_MAX_WORKERS', '8'))
+        # Remotos traídos en paralelo por git_fetch
+        self.fetch_jobs = int(os.getenv('GIT_FETCH_JOBS', '4'))
+        # Todos los tools aceptan un repositorio o un glob de repositorios (metrics es del proceso).
+        # Sobre copias: los specs de @tool son de la clase y los comparten todas las instancias
+        self.tool_specs = [copy.deepcopy(spec) for spec in self.tool_specs]
+        self._tools_json = None
+        for spec in self.tool_specs:
+            if spec["name"] == "metrics":
+                continue
+            spec["inputSchema"]["properties"]["repo"] = {
+                "type": "string",
+                "description": "Ruta del repositorio o glob de repositorios, ej. ~/services/* (default: directorio actual)"
+            }
+
+    @staticmethod
+    async def _read_progress(stream: asyncio.StreamReader, on_progress: Callable[[str], None]) -> bytes:
+        """Leer el stderr de git reenviando cada línea de --progress (separadas por \\r o \\n)
+
+        Retorna el stderr sin las actualizaciones intermedias: de cada línea reescrita
+        con \\r queda el último estado.
+        """
+        lines = []
+        current = b""
+        pending = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            pending += chunk
+            while True:
+                cut = min((i for i in (pending.find(b"\r"), pending.find(b"\n")) if i >= 0), default=-1)
+                if cut < 0:
+                    break
+                segment, separator, pending = pending[:cut], pending[cut:cut + 1], pending[cut + 1:]
+                if segment.strip():
+                    current = segment
+                    on_progress(segment.decode('utf-8', errors='replace').strip())
+                if separator == b"\n":
+                    lines.append(current)
+                    current = b""
+        lines.append(current + pending)
+        return b"\n".join(line for line in lines if line.strip())
+
+    async def _run_git_command(self, command: List[str], cwd: str = None,
+                               on_progress: Callable[[str], None] = None) -> Dict[str, Any]:
+        """Ejecutar comando git sin bloquear el event loop y retornar resultado
+
+        Con on_progress el stderr se lee a medida que llega (para --progress).
+        """
         try:
-            result = subprocess.run(
-                ['git'] + command,
-                cwd=cwd or self.base_path,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            process = await _spawn_git(*command, cwd=cwd or self.base_path)
+            try:
+                # El límite de tiempo es el deadline del request (ver cancellation.py)
+                if on_progress is None:
+                    stdout, stderr = await process.communicate()
+                else:
+                    stdout, stderr = await asyncio.gather(
+                        process.stdout.read(), self._read_progress(process.stderr, on_progress)
+                    )
+                    await process.wait()
+            except asyncio.CancelledError:
+                # Cancelado o deadline vencido: matar git con sus hooks, ssh y helpers,
+                # que comparten los pipes y si no los mantendrían abiertos
+                _kill_group(process)
+                await process.wait()
+                raise
             return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout.strip(),
-                "stderr": result.stderr.strip(),
-                "code": result.returncode
+                "success": process.returncode == 0,
+                "stdout": stdout.decode('utf-8', errors='replace').strip(),
+                "stderr": stderr.decode('utf-8', errors='replace').strip(),
+                "code": process.returncode
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    async def initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {"tools": {"listChanged": False}},
-            "serverInfo": {
-                "name": "git-python-mcp-server",
-                "version": "1.0.0"
-            }
-        }
+    async def _backend(self, path: str = None) -> Optional[GitBackend]:
+        """Backend persistente del repositorio; None si está desactivado o no es un repo"""
+        if not self.persistent:
+            return None
+        path = path or self.base_path
+        backend = self.backends.get(path)
+        if backend is not None:
+            self.backends.move_to_end(path)
+        else:
+            # Un único fork por repositorio para ubicar .git
+            result = await self._run_git_command(["rev-parse", "--absolute-git-dir", "--git-common-dir"], cwd=path)
+            if not result["success"]:
+                return None
+            git_dir, common_dir = result["stdout"].split("\n")
+            short = await self._run_git_command(["rev-parse", "--short", "HEAD"], cwd=path)
+            abbrev = len(short["stdout"]) if short["success"] else 7
+            # Otra llamada concurrente pudo crearlo mientras tanto
+            backend = self.backends.setdefault(path, GitBackend(path, git_dir, os.path.join(path, common_dir), abbrev))
+            while len(self.backends) > self.max_backends:
+                _, evicted = self.backends.popitem(last=False)
+                await evicted.release()
+        return backend
 
-    async def list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "tools": [
-                {
-                    "name": "git_status",
-                    "description": "Obtener estado del repositorio git",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                },
-                {
-                    "name": "git_log",
-                    "description": "Ver historial de commits",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "limit": {"type": "number", "description": "Número de commits (default: 10)"},
-                            "oneline": {"type": "boolean", "description": "Formato compacto"}
-                        }
-                    }
-                },
-                {
-                    "name": "git_diff",
-                    "description": "Ver diferencias en archivos",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "file": {"type": "string", "description": "Archivo específico"},
-                            "staged": {"type": "boolean", "description": "Ver cambios en staging"}
-                        }
-                    }
-                },
-                {
-                    "name": "git_branch",
-                    "description": "Gestionar ramas",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "action": {"type": "string", "description": "list, create, switch, delete"},
-                            "name": {"type": "string", "description": "Nombre de rama"}
-                        }
-                    }
-                },
-                {
-                    "name": "git_add",
-                    "description": "Agregar archivos al staging",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "files": {"type": "array", "items": {"type": "string"}, "description": "Archivos a agregar"}
-                        }
-                    }
-                },
-                {
-                    "name": "git_commit",
-                    "description": "Crear commit",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "message": {"type": "string", "description": "Mensaje del commit"}
-                        },
-                        "required": ["message"]
-                    }
-                },
-                {
-                    "name": "git_push",
-                    "description": "Enviar cambios al repositorio remoto",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "remote": {"type": "string", "description": "Remoto (default: origin)"},
-                            "branch": {"type": "string", "description": "Rama (default: current)"}
-                        }
-                    }
-                },
-                {
-                    "name": "git_pull",
-                    "description": "Traer cambios del repositorio remoto",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "remote": {"type": "string", "description": "Remoto (default: origin)"},
-                            "branch": {"type": "string", "description": "Rama (default: current)"}
-                        }
-                    }
-                }
-            ]
+    async def aclose(self):
+        for backend in list(self.backends.values()):
+            await backend.aclose()
+
+    def _resolve_repos(self, repo: str) -> List[str]:
+        """Un repositorio o un glob de repositorios, relativos al directorio del servidor"""
+        if not repo:
+            return [self.base_path]
+        pattern = os.path.normpath(os.path.join(self.base_path, os.path.expanduser(repo)))
+        if not any(char in repo for char in "*?["):
+            if not os.path.isdir(pattern):
+                raise ValueError(f"No existe el directorio '{repo}'")
+            return [pattern]
+        repos = sorted(path for path in glob.glob(pattern) if os.path.exists(os.path.join(path, '.git')))
+        if not repos:
+            raise ValueError(f"Ningún repositorio coincide con '{repo}'")
+        return repos
+
+    def _git_progress(self, params: Dict[str, Any]) -> Optional[Callable[[str], None]]:
+        """Callback que reenvía las líneas de --progress de git como progreso MCP (~10 por segundo)"""
+        progress_token = params.get("_meta", {}).get("progressToken")
+        if progress_token is None:
+            return None
+        sent = itertools.count(1)
+        last = [0.0, ""]
+        loop = asyncio.get_running_loop()
+        
+        def on_progress(line: str):
+            # Siempre el cierre de cada fase ("..., done."), el resto con throttle
+            now = loop.time()
+            phase_done = line.endswith("done.") and line != last[1]
+            if phase_done or now - last[0] >= 0.1:
+                last[0], last[1] = now, line
+                self._notify_progress(progress_token, next(sent), None, line)
+        
+        return on_progress
+
+    @staticmethod
+    def _fetch_options(arguments: Dict[str, Any]) -> List[str]:
+        """Opciones de shallow compartidas por fetch y pull (git pull no acepta --filter)"""
+        options = []
+        if arguments.get("depth"):
+            options.append(f"--depth={int(arguments['depth'])}")
+        if arguments.get("deepen"):
+            options.append(f"--deepen={int(arguments['deepen'])}")
+        if arguments.get("shallow_since"):
+            options.append(f"--shallow-since={arguments['shallow_since']}")
+        if arguments.get("unshallow"):
+            options.append("--unshallow")
+        return options
+
+    @staticmethod
+    def _check_refnames(*names: str):
+        for name in names:
+            if name.startswith("-"):
+                raise ValueError(f"Nombre inválido: {name}")
+
+    @staticmethod
+    def _log_filters(arguments: Dict[str, Any]) -> List[str]:
+        """Argumentos de git log para revisión, autor, fechas y paths"""
+        args = []
+        if arguments.get("author"):
+            args.append(f"--author={arguments['author']}")
+        if arguments.get("since"):
+            args.append(f"--since={arguments['since']}")
+        if arguments.get("until"):
+            args.append(f"--until={arguments['until']}")
+        revision = arguments.get("revision", "")
+        if revision:
+            if revision.startswith("-"):
+                raise ValueError(f"Revisión inválida: {revision}")
+            args.append(revision)
+        if arguments.get("paths"):
+            args += ["--"] + list(arguments["paths"])
+        return args
+
+    async def _generated_by_attributes(self, paths: List[str], cwd: str = None) -> set:
+        """Paths marcados linguist-generated o -diff en .gitattributes"""
+        generated = set()
+        for start in range(0, len(paths), 1000):
+            result = await self._run_git_command(["check-attr", "-z", "linguist-generated", "diff", "--"] + paths[start:start + 1000], cwd=cwd)
+            if not result["success"]:
+                continue
+            tokens = result["stdout"].split("\0")
+            for path, attribute, value in zip(tokens[0::3], tokens[1::3], tokens[2::3]):
+                if (attribute == "linguist-generated" and value in ("set", "true")) or (attribute == "diff" and value == "unset"):
+                    generated.add(path)
+        return generated
+
+    async def _diff_summary(self, diff_args: List[str], file_path: str, skip: int, limit: int,
+                            cwd: str = None) -> Dict[str, Any]:
+        """Fase 1: estado y líneas por archivo, sin contenido; binarios y generados aparte"""
+        cmd = ["diff", "--raw", "--numstat", "-z"] + diff_args
+        if file_path:
+            cmd += ["--", file_path]
+        result = await self._run_git_command(cmd, cwd=cwd)
+        if not result["success"]:
+            return {"error": result.get("stderr") or result.get("error", "Error ejecutando git diff")}
+        
+        files = _parse_diff_summary(result["stdout"])
+        by_attributes = await self._generated_by_attributes([entry["path"] for entry in files], cwd) if files else set()
+        included = []
+        excluded = []
+        for entry in files:
+            if entry["binary"]:
+                excluded.append({"path": entry["path"], "reason": "binary"})
+            elif entry["path"] in by_attributes or _is_generated(entry["path"]):
+                excluded.append({"path": entry["path"], "reason": "generated", "added": entry["added"], "deleted": entry["deleted"]})
+            else:
+                del entry["binary"]
+                included.append(entry)
+        
+        summary = {
+            "totals": {
+                "files": len(files),
+                "added": sum(entry["added"] for entry in files),
+                "deleted": sum(entry["deleted"] for entry in files)
+            },
+            "files": included[skip:skip + limit],
+            "excluded": excluded if skip == 0 else []
         }
+        if skip + limit < len(included):
+            summary["next_skip"] = skip + limit
+        return summary
+
+    async def _diff_file(self, diff_args: List[str], file_path: str, start_hunk: int, start_line: int,
+                         max_bytes: int, max_lines: int, only_hunk: int = None, cwd: str = None) -> Dict[str, Any]:
+        """Fase 2: diff de un archivo leído línea a línea hasta agotar el presupuesto
+
+        El proceso se corta apenas se llena el presupuesto: ni el servidor ni el
+        cliente cargan el diff completo.
+        """
+        if only_hunk is not None:
+            start_hunk = max(start_hunk, int(only_hunk))
+        process = await _spawn_git('diff', *diff_args, '--', file_path, cwd=cwd or self.base_path, limit=1 << 20)
+        header = []
+        lines = []
+        used_bytes = 0
+        hunk = -1
+        line_no = 0
+        position = None
+        eof = False
+        try:
+            while True:
+                try:
+                    raw = await process.stdout.readline()
+                except ValueError:
+                    # Línea de más de 1 MiB (minificado): se corta acá
+                    lines.append("... (línea demasiado larga, diff interrumpido)")
+                    break
+                if not raw:
+                    eof = True
+                    break
+                line = raw.decode('utf-8', errors='replace').rstrip("\n")
+                if line.startswith("@@"):
+                    hunk += 1
+                    line_no = 0
+                if hunk < 0:
+                    header.append(line)
+                    continue
+                if only_hunk is not None and hunk > int(only_hunk):
+                    break
+                if (hunk, line_no) < (start_hunk, start_line):
+                    line_no += 1
+                    continue
+                if lines and (used_bytes + len(raw) > max_bytes or len(lines) >= max_lines):
+                    position = (hunk, line_no)
+                    break
+                if not lines and line_no > 0:
+                    lines.append(f"@@ (continuación del hunk {hunk}, línea {line_no}) @@")
+                lines.append(line[:max_bytes])
+                used_bytes += len(raw)
+                line_no += 1
+        finally:
+            if not eof and process.returncode is None:
+                _kill_group(process)
+            await process.wait()
+        
+        if eof and process.returncode != 0:
+            stderr = await process.stderr.read()
+            return {"error": stderr.decode('utf-8', errors='replace').strip()}
+        result = {"path": file_path, "diff": "\n".join(header + lines) or "No changes"}
+        if position is not None:
+            result["next"] = position
+        return result
+
+    async def _stream_grep(self, grep_args: List[str], skip: int, limit: int, max_bytes: int,
+                           on_match: Callable[[Dict[str, Any]], None] = None, cwd: str = None) -> Dict[str, Any]:
+        """Correr git grep y entregar los matches a medida que llegan
+
+        El orden de salida de git grep es estable aun con threads, así que la página
+        siguiente es saltear los matches ya vistos. El proceso se corta apenas se
+        llena la página o el tope de bytes.
+        """
+        process = await _spawn_git('grep', *grep_args, cwd=cwd or self.base_path)
+        matches = []
+        used_bytes = 0
+        seen = 0
+        next_skip = None
+        pending = b""
+        eof = False
+        try:
+            while next_skip is None:
+                chunk = await process.stdout.read(65536)
+                if not chunk:
+                    eof = True
+                    break
+                *lines, pending = (pending + chunk).split(b"\n")
+                for raw in lines:
+                    seen += 1
+                    if seen <= skip:
+                        continue
+                    if len(matches) >= limit or (matches and used_bytes + len(raw) > max_bytes):
+                        next_skip = seen - 1
+                        break
+                    path, line, text = raw.decode('utf-8', errors='replace').split("\0", 2)
+                    match = {"path": path, "line": int(line), "text": text[:GREP_LINE_MAX]}
+                    matches.append(match)
+                    used_bytes += len(raw)
+                    if on_match:
+                        on_match(match)
+        finally:
+            if not eof and process.returncode is None:
+                _kill_group(process)
+            await process.wait()
+        
+        # git grep sale con 1 cuando no hay matches
+        if eof and process.returncode not in (0, 1):
+            stderr = await process.stderr.read()
+            return {"error": stderr.decode('utf-8', errors='replace').strip()}
+        return {"matches": matches, "next_skip": next_skip}
+
+    async def _ensure_commit_graph(self, path: str = None):
+        """Escribir commit-graph con Bloom filters de paths si el repo no lo tiene (una vez por repositorio)"""
+        if os.getenv('GIT_LOG_COMMIT_GRAPH', '1').lower() in ('0', 'false', 'no'):
+            return
+        backend = await self._backend(path)
+        if backend is None or backend.commit_graph_checked or backend.commit_graph_task is not None:
+            return
+        if time.monotonic() < backend.commit_graph_retry_at:
+            return
+        info = os.path.join(backend.common_dir, 'objects', 'info')
+        if os.path.exists(os.path.join(info, 'commit-graph')) or os.path.isdir(os.path.join(info, 'commit-graphs')):
+            backend.commit_graph_checked = True
+            return
+        # En segundo plano: este git_log no espera la escritura ni la descuenta de su deadline
+        backend.commit_graph_task = asyncio.create_task(self._write_commit_graph(backend, path))
+
+    async def _write_commit_graph(self, backend: GitBackend, path: str = None):
+        try:
+            result = await asyncio.wait_for(
+                self._run_git_command(["commit-graph", "write", "--reachable", "--changed-paths"], cwd=path),
+                COMMIT_GRAPH_TIMEOUT
+            )
+            failed = not result["success"]
+        except asyncio.TimeoutError:
+            failed = True
+        finally:
+            backend.commit_graph_task = None
+        if failed:
+            # Reintentar más tarde (repo grande, disco lleno, sin permisos de escritura...)
+            backend.commit_graph_retry_at = time.monotonic() + COMMIT_GRAPH_RETRY
+        else:
+            backend.commit_graph_checked = True
+
+    async def _stream_log(self, filters: List[str], skip: int, limit: int,
+                          on_record: Callable[[Dict[str, Any]], None] = None, cwd: str = None) -> Dict[str, Any]:
+        """Correr git log -z y parsear los registros a medida que llegan por el pipe
+
+        Pide limit + 1 commits: el extra solo indica si hay una página siguiente.
+        """
+        process = await _spawn_git('log', '-z', f'--format={LOG_FORMAT}', f'--skip={skip}', f'-n{limit + 1}',
+                                   *filters, cwd=cwd or self.base_path)
+        records = []
+        fields = []
+        pending = b""
+        try:
+            while True:
+                chunk = await process.stdout.read(65536)
+                if not chunk:
+                    break
+                *complete, pending = (pending + chunk).split(b"\0")
+                for value in complete:
+                    fields.append(value.decode('utf-8', errors='replace'))
+                    if len(fields) < len(LOG_FIELDS):
+                        continue
+                    record = dict(zip((name for name, _ in LOG_FIELDS), fields))
+                    record["parents"] = record["parents"].split()
+                    fields = []
+                    records.append(record)
+                    if len(records) <= limit and on_record:
+                        on_record(record)
+            stderr = await process.stderr.read()
+        finally:
+            # Cancelado o deadline vencido: no dejar el proceso git corriendo
+            if process.returncode is None and not process.stdout.at_eof():
+                _kill_group(process)
+            await process.wait()
+        if process.returncode != 0:
+            return {"error": stderr.decode('utf-8', errors='replace').strip()}
+        return {"commits": records[:limit], "has_more": len(records) > limit}
 
     async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
         tool_name = params.get("name")
         arguments = params.get("arguments", {})
         
+        if tool_name not in self.tools:
+            return {
+                "content": [{"type": "text", "text": f"Herramienta '{tool_name}' no encontrada"}],
+                "isError": True
+            }
+        if tool_name == "metrics":
+            # Un único volcado aunque llegue un glob en repo
+            return await super().call_tool(params)
         try:
-            if tool_name == "git_status":
-                result = self._run_git_command(["status", "--porcelain"])
-                if result["success"]:
-                    detailed = self._run_git_command(["status"])
-                    return {
-                        "content": [{"type": "text", "text": f"Git Status:\n{detailed['stdout']}"}]
-                    }
-                else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('stderr', 'Error ejecutando git status')}"}]
-                    }
-            
-            elif tool_name == "git_log":
-                limit = arguments.get("limit", 10)
-                oneline = arguments.get("oneline", True)
-                
-                cmd = ["log", f"-{limit}"]
-                if oneline:
-                    cmd.append("--oneline")
-                else:
-                    cmd.extend(["--graph", "--pretty=format:%h - %an, %ar : %s"])
-                
-                result = self._run_git_command(cmd)
-                return {
-                    "content": [{"type": "text", "text": f"Git Log:\n{result['stdout']}"}]
-                }
-            
-            elif tool_name == "git_diff":
-                file_path = arguments.get("file", "")
-                staged = arguments.get("staged", False)
-                
-                cmd = ["diff"]
-                if staged:
-                    cmd.append("--staged")
-                if file_path:
-                    cmd.append(file_path)
-                
-                result = self._run_git_command(cmd)
-                return {
-                    "content": [{"type": "text", "text": f"Git Diff:\n{result['stdout'] or 'No changes'}"}]
-                }
-            
-            elif tool_name == "git_branch":
-                action = arguments.get("action", "list")
-                name = arguments.get("name", "")
-                
-                if action == "list":
-                    result = self._run_git_command(["branch", "-a"])
-                elif action == "create" and name:
-                    result = self._run_git_command(["checkout", "-b", name])
-                elif action == "switch" and name:
-                    result = self._run_git_command(["checkout", name])
-                elif action == "delete" and name:
-                    result = self._run_git_command(["branch", "-d", name])
-                else:
-                    return {
-                        "content": [{"type": "text", "text": "Acción no válida o falta nombre de rama"}]
-                    }
-                
-                return {
-                    "content": [{"type": "text", "text": f"Git Branch ({action}):\n{result['stdout']}\n{result.get('stderr', '')}"}]
-                }
+            repos = self._resolve_repos(arguments.get("repo", ""))
+        except ValueError as e:
+            return {
+                "content": [{"type": "text", "text": f"Error: {str(e)}"}],
+                "isError": True
+            }
+        if len(repos) == 1:
+            return await self._call_repo_tool(tool_name, arguments, params, repos[0])
+        return await self._fan_out(tool_name, arguments, params, repos)
+
+    async def _call_repo_tool(self, tool_name: str, arguments: Dict[str, Any], params: Dict[str, Any],
+                              repo: str) -> Dict[str, Any]:
+        """Ejecutar un tool sobre un repositorio"""
+        try:
+            return await self.tools[tool_name](arguments, params, repo)
+        except Exception as e:
+            return {
+                "content": [{"type": "text", "text": f"Error ejecutando {tool_name}: {str(e)}"}],
+                "isError": True
+            }
+
+    async def _fan_out(self, tool_name: str, arguments: Dict[str, Any], params: Dict[str, Any],
+                       repos: List[str]) -> Dict[str, Any]:
+        """Correr el tool en varios repositorios con un pool acotado; cada resultado sale al terminar"""
+        pool = asyncio.Semaphore(self.max_workers)
+        progress_token = params.get("_meta", {}).get("progressToken")
+        # Sin _meta: el progreso lo emite el fan-out, uno por repositorio
+        repo_params = {"name": tool_name, "arguments": arguments}
+        
+        async def run_one(repo: str):
+            async with pool:
+                return repo, await self._call_repo_tool(tool_name, arguments, repo_params, repo)
+        
+        sections = []
+        failed = 0
+        tasks = [asyncio.create_task(run_one(repo)) for repo in repos]
+        try:
+            for done, next_result in enumerate(asyncio.as_completed(tasks), 1):
+                repo, result = await next_result
+                text = "\n".join(item["text"] for item in result["content"])
+                section = f"=== {os.path.relpath(repo, self.base_path)} ===\n{text}"
+                sections.append(section)
+                failed += bool(result.get("isError"))
+                self._notify_progress(progress_token, done, len(repos), section)
+        finally:
+            # Si el request se cancela, los repos pendientes también
+            for task in tasks:
+                task.cancel()
+        
+        header = f"{len(repos)} repositorios" + (f", {failed} con error" if failed else "")
+        return {
+            "content": [{"type": "text", "text": header + "\n\n" + "\n\n".join(sections)}]
+        }
+
+    @tool({
+        "name": "git_status",
+        "description": "Estado del repositorio (porcelain v2 estructurado: rama, ahead/behind, cambios, untracked)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    })
+    async def git_status(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        backend = await self._backend(repo)
+        if backend is not None:
+            status = await backend.status(self._run_git_command)
+        else:
+            result = await self._run_git_command(["status", "--porcelain=v2", "-z", "--branch"], cwd=repo)
+            status = _parse_status_v2(result["stdout"]) if result["success"] else {
+                "error": result.get("stderr") or result.get("error", "Error ejecutando git status")
+            }
+        if "error" in status:
+            return {
+                "content": [{"type": "text", "text": f"Error: {status['error']}"}]
+            }
+        return {
+            "content": [{"type": "text", "text": json.dumps(status, indent=2, ensure_ascii=False)}]
+        }
+
+    @tool({
+        "name": "git_log",
+        "description": "Ver historial de commits",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "number", "description": "Número de commits (default: 10)"},
+                "oneline": {"type": "boolean", "description": "Formato compacto"},
+                "structured": {"type": "boolean", "description": "Registros JSON paginados con cursor"},
+                "revision": {"type": "string", "description": "Revisión o rango, ej. main..feature (default: HEAD)"},
+                "paths": {"type": "array", "items": {"type": "string"}, "description": "Solo commits que tocan estos paths"},
+                "author": {"type": "string", "description": "Filtrar por autor"},
+                "since": {"type": "string", "description": "Desde fecha, ej. 2024-01-01 o '2 weeks ago'"},
+                "until": {"type": "string", "description": "Hasta fecha"},
+                "cursor": {"type": "string", "description": "next_cursor de la página anterior (modo structured)"}
+            }
+        }
+    })
+    async def git_log(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        limit = arguments.get("limit", 10)
+        oneline = arguments.get("oneline", True)
+        filters = self._log_filters(arguments)
+        
+        if arguments.get("structured"):
+            query = json.dumps(filters)
+            skip = _decode_cursor(query, arguments["cursor"])["skip"] if arguments.get("cursor") else 0
+            if arguments.get("paths"):
+                await self._ensure_commit_graph(repo)
             
-            elif tool_name == "git_add":
-                files = arguments.get("files", [])
-                if not files:
-                    files = ["."]
-                
-                result = self._run_git_command(["add"] + files)
-                return {
-                    "content": [{"type": "text", "text": f"Git Add:\n{result['stdout'] or 'Files added successfully'}\n{result.get('stderr', '')}"}]
-                }
+            # Cada commit sale como progreso MCP apenas se parsea
+            progress_token = params.get("_meta", {}).get("progressToken")
+            streamed = itertools.count(1)
             
-            elif tool_name == "git_commit":
-                message = arguments.get("message", "")
-                if not message:
-                    return {
-                        "content": [{"type": "text", "text": "Error: Mensaje de commit requerido"}]
-                    }
-                
-                result = self._run_git_command(["commit", "-m", message])
-                return {
-                    "content": [{"type": "text", "text": f"Git Commit:\n{result['stdout']}\n{result.get('stderr', '')}"}]
-                }
+            def on_record(record: Dict[str, Any]):
+                self._notify_progress(progress_token, next(streamed), int(limit), json.dumps(record, ensure_ascii=False))
             
-            elif tool_name == "git_push":
-                remote = arguments.get("remote", "origin")
-                branch = arguments.get("branch", "")
-                
-                cmd = ["push", remote]
-                if branch:
-                    cmd.append(branch)
-                
-                result = self._run_git_command(cmd)
+            result = await self._stream_log(filters, skip, int(limit), on_record, repo)
+            if "error" in result:
                 return {
-                    "content": [{"type": "text", "text": f"Git Push:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+                    "content": [{"type": "text", "text": f"Error: {result['error']}"}]
                 }
-            
-            elif tool_name == "git_pull":
-                remote = arguments.get("remote", "origin")
-                branch = arguments.get("branch", "")
-                
-                cmd = ["pull", remote]
-                if branch:
-                    cmd.append(branch)
-                
-                result = self._run_git_command(cmd)
+            page = {
+                "commits": result["commits"],
+                "next_cursor": _encode_cursor(query, skip=skip + len(result["commits"])) if result["has_more"] else None
+            }
+            return {
+                "content": [{"type": "text", "text": json.dumps(page, indent=2, ensure_ascii=False)}]
+            }
+        
+        if oneline and not filters:
+            backend = await self._backend(repo)
+            lines = await backend.log_oneline(int(limit)) if backend else None
+            if lines is not None:
                 return {
-                    "content": [{"type": "text", "text": f"Git Pull:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+                    "content": [{"type": "text", "text": "Git Log:\n" + "\n".join(lines)}]
                 }
-            
-            else:
+        
+        cmd = ["log", f"-{limit}"]
+        if oneline:
+            cmd.append("--oneline")
+        else:
+            cmd.extend(["--graph", "--pretty=format:%h - %an, %ar : %s"])
+        cmd += filters
+        
+        result = await self._run_git_command(cmd, cwd=repo)
+        return {
+            "content": [{"type": "text", "text": f"Git Log:\n{result['stdout']}"}]
+        }
+
+    @tool({
+        "name": "git_show",
+        "description": "Leer un objeto git (blob, tree, commit o tag)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "rev": {"type": "string", "description": "Revisión u objeto, ej. HEAD, HEAD~2:README.md"}
+            },
+            "required": ["rev"]
+        }
+    })
+    async def git_show(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        rev = arguments.get("rev", "")
+        backend = await self._backend(repo)
+        if not rev or backend is None:
+            result = await self._run_git_command(["cat-file", "-p", rev or "HEAD"], cwd=repo)
+            return {
+                "content": [{"type": "text", "text": f"Git Show:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+            }
+        
+        obj = await backend.read_object(rev)
+        if obj is None:
+            return {
+                "content": [{"type": "text", "text": f"Error: objeto '{rev}' no encontrado"}]
+            }
+        sha, kind, data = obj
+        if kind == "tree":
+            text = _format_tree(data)
+        elif b"\0" in data[:8000]:
+            text = f"(archivo binario, {len(data)} bytes)"
+        else:
+            text = data[:SHOW_MAX_BYTES].decode('utf-8', errors='replace')
+            if len(data) > SHOW_MAX_BYTES:
+                text += f"\n... (truncado, {len(data)} bytes en total)"
+        return {
+            "content": [{"type": "text", "text": f"Git Show ({kind} {sha}):\n{text}"}]
+        }
+
+    @tool({
+        "name": "git_grep",
+        "description": "Buscar texto en el working tree, el index o una revisión (git grep)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "pattern": {"type": "string", "description": "Expresión a buscar"},
+                "revision": {"type": "string", "description": "Buscar en esta revisión o tree, ej. HEAD~5"},
+                "cached": {"type": "boolean", "description": "Buscar en el index en vez del working tree"},
+                "paths": {"type": "array", "items": {"type": "string"}, "description": "Limitar a estos paths o globs"},
+                "ignore_case": {"type": "boolean", "description": "Ignorar mayúsculas"},
+                "fixed_strings": {"type": "boolean", "description": "Texto literal en vez de regex"},
+                "max_count": {"type": "number", "description": "Máximo de matches por archivo"},
+                "threads": {"type": "number", "description": "Threads de git grep (default: los de git)"},
+                "limit": {"type": "number", "description": "Matches por página (default: 100)"},
+                "max_bytes": {"type": "number", "description": "Tope de bytes de texto por página (default: 20000)"},
+                "cursor": {"type": "string", "description": "next_cursor de la página anterior"}
+            },
+            "required": ["pattern"]
+        }
+    })
+    async def git_grep(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        pattern = arguments.get("pattern", "")
+        if not pattern:
+            return {
+                "content": [{"type": "text", "text": "Error: pattern requerido"}]
+            }
+        revision = arguments.get("revision", "")
+        if revision.startswith("-"):
+            raise ValueError(f"Revisión inválida: {revision}")
+        
+        grep_args = ["-n", "--null", "-I"]
+        if arguments.get("ignore_case"):
+            grep_args.append("-i")
+        if arguments.get("fixed_strings"):
+            grep_args.append("-F")
+        if arguments.get("max_count"):
+            grep_args.append(f"--max-count={int(arguments['max_count'])}")
+        if arguments.get("threads"):
+            grep_args.append(f"--threads={int(arguments['threads'])}")
+        grep_args += ["-e", pattern]
+        if arguments.get("cached"):
+            grep_args.append("--cached")
+        if revision:
+            grep_args.append(revision)
+        if arguments.get("paths"):
+            grep_args += ["--"] + list(arguments["paths"])
+        
+        query = json.dumps(grep_args)
+        skip = _decode_cursor(query, arguments["cursor"])["skip"] if arguments.get("cursor") else 0
+        limit = int(arguments.get("limit", 100))
+        
+        # Cada match sale como progreso MCP apenas git lo escribe
+        progress_token = params.get("_meta", {}).get("progressToken")
+        streamed = itertools.count(1)
+        
+        def on_match(match: Dict[str, Any]):
+            self._notify_progress(progress_token, next(streamed), limit, json.dumps(match, ensure_ascii=False))
+        
+        result = await self._stream_grep(grep_args, skip, limit, int(arguments.get("max_bytes", 20000)), on_match, repo)
+        if "error" in result:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result['error']}"}]
+            }
+        page = {"matches": result["matches"], "next_cursor": None}
+        if result["next_skip"] is not None:
+            page["next_cursor"] = _encode_cursor(query, skip=result["next_skip"])
+        return {
+            "content": [{"type": "text", "text": json.dumps(page, indent=2, ensure_ascii=False)}]
+        }
+
+    @tool({
+        "name": "git_diff",
+        "description": "Ver diferencias en archivos",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "file": {"type": "string", "description": "Archivo específico (sin file: resumen por archivo)"},
+                "staged": {"type": "boolean", "description": "Ver cambios en staging"},
+                "revision": {"type": "string", "description": "Revisión o rango a comparar, ej. HEAD~3 o main..feature"},
+                "summary": {"type": "boolean", "description": "Solo resumen por archivo (default: true sin file)"},
+                "hunk": {"type": "number", "description": "Devolver solo este hunk (desde 0)"},
+                "max_bytes": {"type": "number", "description": "Presupuesto de bytes del diff (default: 20000)"},
+                "max_lines": {"type": "number", "description": "Presupuesto de líneas del diff (default: 400)"},
+                "limit": {"type": "number", "description": "Archivos por página del resumen (default: 200)"},
+                "cursor": {"type": "string", "description": "next_cursor de la respuesta anterior"}
+            }
+        }
+    })
+    async def git_diff(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        file_path = arguments.get("file", "")
+        staged = arguments.get("staged", False)
+        revision = arguments.get("revision", "")
+        if revision.startswith("-"):
+            raise ValueError(f"Revisión inválida: {revision}")
+        
+        diff_args = ["--no-ext-diff", "-M"]
+        if staged:
+            diff_args.append("--staged")
+        if revision:
+            diff_args.append(revision)
+        query = json.dumps([diff_args, file_path])
+        position = _decode_cursor(query, arguments["cursor"]) if arguments.get("cursor") else {}
+        
+        if arguments.get("summary", not file_path):
+            result = await self._diff_summary(diff_args, file_path, position.get("skip", 0), int(arguments.get("limit", 200)), repo)
+            if "next_skip" in result:
+                result["next_cursor"] = _encode_cursor(query, skip=result.pop("next_skip"))
+        else:
+            result = await self._diff_file(
+                diff_args, file_path,
+                position.get("hunk", 0), position.get("line", 0),
+                int(arguments.get("max_bytes", 20000)), int(arguments.get("max_lines", 400)),
+                arguments.get("hunk"), repo
+            )
+            if "next" in result:
+                hunk, line = result.pop("next")
+                result["next_cursor"] = _encode_cursor(query, hunk=hunk, line=line)
+        
+        if "error" in result:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result['error']}"}]
+            }
+        return {
+            "content": [{"type": "text", "text": json.dumps(result, indent=2, ensure_ascii=False)}]
+        }
+
+    @tool({
+        "name": "git_branch",
+        "description": "Gestionar ramas",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "action": {"type": "string", "description": "list, create, switch, delete"},
+                "name": {"type": "string", "description": "Nombre de rama"}
+            }
+        }
+    })
+    async def git_branch(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        action = arguments.get("action", "list")
+        name = arguments.get("name", "")
+        
+        if action == "list":
+            backend = await self._backend(repo)
+            branches = backend.branch_list() if backend else None
+            if branches is not None:
                 return {
-                    "content": [{"type": "text", "text": f"Herramienta '{tool_name}' no encontrada"}],
-                    "isError": True
+                    "content": [{"type": "text", "text": f"Git Branch ({action}):\n{branches}\n"}]
                 }
-                
-        except Exception as e:
+            result = await self._run_git_command(["branch", "-a"], cwd=repo)
+        elif action == "create" and name:
+            result = await self._run_git_command(["checkout", "-b", name], cwd=repo)
+        elif action == "switch" and name:
+            result = await self._run_git_command(["checkout", name], cwd=repo)
+        elif action == "delete" and name:
+            result = await self._run_git_command(["branch", "-d", name], cwd=repo)
+        else:
             return {
-                "content": [{"type": "text", "text": f"Error ejecutando {tool_name}: {str(e)}"}],
-                "isError": True
+                "content": [{"type": "text", "text": "Acción no válida o falta nombre de rama"}]
             }
+        
+        return {
+            "content": [{"type": "text", "text": f"Git Branch ({action}):\n{result['stdout']}\n{result.get('stderr', '')}"}]
+        }
 
-    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        method = request.get("method")
-        params = request.get("params", {})
-        request_id = request.get("id")
+    @tool({
+        "name": "git_add",
+        "description": "Agregar archivos al staging",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "files": {"type": "array", "items": {"type": "string"}, "description": "Archivos a agregar"}
+            }
+        }
+    })
+    async def git_add(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        files = arguments.get("files", [])
+        if not files:
+            files = ["."]
         
-        try:
-            if method == "initialize":
-                result = await self.initialize(params)
-            elif method == "tools/list":
-                result = await self.list_tools(params)
-            elif method == "tools/call":
-                result = await self.call_tool(params)
-            else:
-                result = {"error": f"Método no soportado: {method}"}
-                
-            return {"jsonrpc": "2.0", "id": request_id, "result": result}
-            
-        except Exception as e:
+        result = await self._run_git_command(["add"] + files, cwd=repo)
+        return {
+            "content": [{"type": "text", "text": f"Git Add:\n{result['stdout'] or 'Files added successfully'}\n{result.get('stderr', '')}"}]
+        }
+
+    @tool({
+        "name": "git_commit",
+        "description": "Crear commit",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string", "description": "Mensaje del commit"}
+            },
+            "required": ["message"]
+        }
+    })
+    async def git_commit(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        message = arguments.get("message", "")
+        if not message:
             return {
-                "jsonrpc": "2.0", 
-                "id": request_id,
-                "error": {"code": -32603, "message": str(e)}
+                "content": [{"type": "text", "text": "Error: Mensaje de commit requerido"}]
             }
+        
+        result = await self._run_git_command(["commit", "-m", message], cwd=repo)
+        return {
+            "content": [{"type": "text", "text": f"Git Commit:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+        }
 
-    async def run(self):
-        while True:
-            try:
-                line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-                if not line:
-                    break
-                    
-                request = json.loads(line.strip())
-                response = await self.handle_request(request)
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0", "id": None,
-                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
-                }
-                print(json.dumps(error_response), flush=True)
+    @tool({
+        "name": "git_push",
+        "description": "Enviar cambios al repositorio remoto (con progressToken reenvía el --progress de git)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "remote": {"type": "string", "description": "Remoto (default: origin)"},
+                "branch": {"type": "string", "description": "Rama (default: current)"}
+            }
+        }
+    })
+    async def git_push(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        remote = arguments.get("remote", "origin")
+        branch = arguments.get("branch", "")
+        
+        self._check_refnames(remote, branch)
+        on_progress = self._git_progress(params)
+        
+        cmd = ["push"] + (["--progress"] if on_progress else []) + [remote]
+        if branch:
+            cmd.append(branch)
+        
+        result = await self._run_git_command(cmd, cwd=repo, on_progress=on_progress)
+        return {
+            "content": [{"type": "text", "text": f"Git Push:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+        }
+
+    @tool({
+        "name": "git_fetch",
+        "description": "Traer refs y objetos de los remotos sin tocar el working tree; varios remotos en paralelo",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "remote": {"type": "string", "description": "Remoto (default: todos)"},
+                "remotes": {"type": "array", "items": {"type": "string"}, "description": "Varios remotos, traídos en paralelo"},
+                "jobs": {"type": "number", "description": "Remotos en paralelo (default: GIT_FETCH_JOBS)"},
+                "prune": {"type": "boolean", "description": "Borrar refs remotas que ya no existen"},
+                "filter": {"type": "string", "description": "Partial clone, ej. blob:none o tree:0"},
+                "depth": {"type": "number", "description": "Fetch shallow con esta profundidad"},
+                "deepen": {"type": "number", "description": "Profundizar un repo shallow N commits"},
+                "shallow_since": {"type": "string", "description": "Fetch shallow desde esta fecha"},
+                "unshallow": {"type": "boolean", "description": "Convertir un repo shallow en completo"}
+            }
+        }
+    })
+    async def git_fetch(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        remotes = list(arguments.get("remotes") or [])
+        if arguments.get("remote"):
+            remotes.insert(0, arguments["remote"])
+        self._check_refnames(*remotes)
+        on_progress = self._git_progress(params)
+        
+        cmd = ["fetch"] + (["--progress"] if on_progress else []) + self._fetch_options(arguments)
+        if arguments.get("filter"):
+            cmd.append(f"--filter={arguments['filter']}")
+        if arguments.get("prune"):
+            cmd.append("--prune")
+        if len(remotes) != 1:
+            # git trae cada remoto en un proceso propio, en paralelo
+            cmd.append(f"--jobs={int(arguments.get('jobs') or self.fetch_jobs)}")
+        cmd += ["--multiple"] + remotes if len(remotes) > 1 else remotes or ["--all"]
+        
+        result = await self._run_git_command(cmd, cwd=repo, on_progress=on_progress)
+        return {
+            "content": [{"type": "text", "text": f"Git Fetch:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+        }
+
+    @tool({
+        "name": "git_pull",
+        "description": "Traer cambios del repositorio remoto (con progressToken reenvía el --progress de git)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "remote": {"type": "string", "description": "Remoto (default: origin)"},
+                "branch": {"type": "string", "description": "Rama (default: current)"},
+                "depth": {"type": "number", "description": "Fetch shallow con esta profundidad"},
+                "deepen": {"type": "number", "description": "Profundizar un repo shallow N commits"},
+                "shallow_since": {"type": "string", "description": "Fetch shallow desde esta fecha"},
+                "unshallow": {"type": "boolean", "description": "Convertir un repo shallow en completo"}
+            }
+        }
+    })
+    async def git_pull(self, arguments: Dict[str, Any], params: Dict[str, Any], repo: str) -> Dict[str, Any]:
+        remote = arguments.get("remote", "origin")
+        branch = arguments.get("branch", "")
+        
+        self._check_refnames(remote, branch)
+        on_progress = self._git_progress(params)
+        
+        cmd = ["pull"] + (["--progress"] if on_progress else []) + self._fetch_options(arguments) + [remote]
+        if branch:
+            cmd.append(branch)
+        
+        result = await self._run_git_command(cmd, cwd=repo, on_progress=on_progress)
+        return {
+            "content": [{"type": "text", "text": f"Git Pull:\n{result['stdout']}\n{result.get('stderr', '')}"}]
+        }
 
 if __name__ == "__main__":
-    server = GitMCPServer()
-    asyncio.run(server.run())
+    GitMCPServer().serve()
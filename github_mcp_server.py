@@ -5,372 +5,1134 @@ Reemplaza el servidor GitHub de Node.js
 """
 
 import asyncio
+import hashlib
+import itertools
 import json
-import sys
 import os
+import random
+import sqlite3
+import threading
+import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Callable
+from urllib.parse import urlparse, parse_qs, quote
 from dotenv import load_dotenv
+from cancellation import CancelToken, RequestCancelled, current_token
+from mcp_runtime import MCPServer, http_session, tool
+from singleflight import SingleFlight
 
 load_dotenv()
 
-class GitHubMCPServer:
-    def __init__(self):
+# Campos de get_repo_info: campo REST -> (selección GraphQL, etiqueta)
+REPO_FIELDS = {
+    "description": ("description", "📝 Descripción"),
+    "html_url": ("url", "🌐 URL"),
+    "stargazers_count": ("stargazerCount", "⭐ Stars"),
+    "forks_count": ("forkCount", "🍴 Forks"),
+    # En REST watchers_count es la cantidad de stars (los suscriptores son subscribers_count)
+    "watchers_count": ("stargazerCount", "👀 Watchers"),
+    "language": ("primaryLanguage { name }", "📊 Language"),
+    "created_at": ("createdAt", "📅 Created"),
+    "updated_at": ("updatedAt", "🔄 Updated"),
+    "size": ("diskUsage", "📏 Size"),
+    "private": ("isPrivate", "🔒 Private"),
+}
+
+class GitHubResponseCache:
+    """Cache persistente en SQLite de respuestas GET, revalidadas con ETag/Last-Modified
+
+    Acotado por antigüedad y cantidad de entradas: cada búsqueda, página o since= es una URL distinta.
+    """
+
+    def __init__(self, path: str, max_entries: int = None, max_age: float = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries or int(os.getenv('GITHUB_CACHE_MAX_ENTRIES', '5000'))
+        self.max_age = max_age or float(os.getenv('GITHUB_CACHE_MAX_AGE', '604800'))
+        self.lock = threading.Lock()
+        # WAL permite que varios procesos lean y escriban el mismo archivo
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, headers TEXT NOT NULL, body TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0}
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT headers, body FROM responses WHERE key = ? AND stored_at > ?",
+                (key, time.time() - self.max_age)
+            ).fetchone()
+        if not row:
+            return None
+        return {"headers": json.loads(row[0]), "data": json.loads(row[1])}
+
+    def touch(self, key: str):
+        """Revalidada con 304: cuenta como recién guardada para la evicción"""
+        with self.lock:
+            self.conn.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+
+    def put(self, key: str, headers: Dict[str, str], data: Any):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, headers, body, stored_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(headers), json.dumps(data), now)
+            )
+            # Evicción: primero lo vencido, después lo revalidado hace más tiempo
+            self.conn.execute("DELETE FROM responses WHERE stored_at <= ?", (now - self.max_age,))
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class GitHubRateLimiter:
+    """Planificador de requests según los límites de GitHub, con un presupuesto por recurso (core, search...)"""
+
+    def __init__(self, max_in_flight: int, reserve: int):
+        self.cond = threading.Condition()
+        self.max_in_flight = max_in_flight
+        self.reserve = reserve          # requests que se dejan sin usar antes del reset
+        self.in_flight = 0
+        self.budgets = {}               # recurso -> {"limit", "remaining", "reset"}
+        self.blocked_until = {}         # recurso -> timestamp (Retry-After / backoff)
+        self.next_allowed = {}          # recurso -> timestamp (espaciado cerca del límite)
+        self.waiting = {}               # ticket (prioridad, orden) -> recurso
+        self.order = itertools.count()
+
+    @staticmethod
+    def resource_for(endpoint: str) -> str:
+        if endpoint.startswith('search/code'):
+            return "code_search"
+        if endpoint.startswith('search/'):
+            return "search"
+        if endpoint == 'graphql':
+            return "graphql"
+        return "core"
+
+    def _wait_time(self, resource: str, now: float) -> float:
+        wait = max(self.blocked_until.get(resource, 0), self.next_allowed.get(resource, 0)) - now
+        budget = self.budgets.get(resource)
+        if budget and budget["remaining"] <= self.reserve and budget["reset"] > now:
+            wait = max(wait, budget["reset"] - now)
+        return max(wait, 0)
+
+    def _wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def acquire(self, resource: str, priority: int, cancel: CancelToken = None):
+        """Esperar turno: menor prioridad primero, y solo si el recurso tiene presupuesto
+
+        Un request cancelado (o con el deadline vencido) deja la cola con RequestCancelled.
+        """
+        cancel = cancel or CancelToken()
+        ticket = (priority, next(self.order))
+        unregister = cancel.on_cancel(self._wake)
+        try:
+            with self.cond:
+                self.waiting[ticket] = resource
+                try:
+                    while True:
+                        cancel.check()
+                        now = time.time()
+                        wait = self._wait_time(resource, now)
+                        if wait <= 0 and self.in_flight < self.max_in_flight:
+                            ahead = any(
+                                other < ticket and self._wait_time(other_resource, now) <= 0
+                                for other, other_resource in self.waiting.items()
+                            )
+                            if not ahead:
+                                break
+                        remaining = cancel.remaining()
+                        if remaining is not None:
+                            wait = min(wait, remaining) if wait > 0 else remaining
+                        self.cond.wait(timeout=wait if wait > 0 else None)
+                finally:
+                    del self.waiting[ticket]
+                    # Otro en la cola pudo quedar primero
+                    self.cond.notify_all()
+                self.in_flight += 1
+                budget = self.budgets.get(resource)
+                if budget:
+                    budget["remaining"] -= 1
+        finally:
+            unregister()
+
+    def release(self, resource: str, response: requests.Response = None, attempt: int = 0) -> bool:
+        """Liberar el turno y actualizar presupuestos; retorna True si hay que reintentar"""
+        retry = False
+        with self.cond:
+            self.in_flight -= 1
+            if response is not None:
+                now = time.time()
+                headers = response.headers
+                resource = headers.get('X-RateLimit-Resource', resource)
+                if 'X-RateLimit-Remaining' in headers:
+                    budget = {
+                        "limit": int(headers.get('X-RateLimit-Limit', 0)),
+                        "remaining": int(headers['X-RateLimit-Remaining']),
+                        "reset": float(headers.get('X-RateLimit-Reset', now))
+                    }
+                    self.budgets[resource] = budget
+                    # Cerca del límite: repartir lo que queda hasta el reset
+                    if 0 < budget["remaining"] < budget["limit"] * 0.1:
+                        self.next_allowed[resource] = now + (budget["reset"] - now) / budget["remaining"]
+                if response.status_code in (403, 429):
+                    retry_after = headers.get('Retry-After')
+                    if retry_after:
+                        self.blocked_until[resource] = now + float(retry_after)
+                        retry = True
+                    elif headers.get('X-RateLimit-Remaining') == '0':
+                        self.blocked_until[resource] = float(headers.get('X-RateLimit-Reset', now))
+                        retry = True
+                    elif 'secondary rate limit' in response.text.lower():
+                        # Backoff exponencial con jitter para el límite secundario
+                        delay = min(60, 5 * 2 ** attempt)
+                        self.blocked_until[resource] = now + random.uniform(delay / 2, delay)
+                        retry = True
+            self.cond.notify_all()
+        return retry
+
+class GitHubIssueMirror:
+    """Mirror local en SQLite de issues y pull requests, con índice FTS5 sobre título y cuerpo"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS issues (
+            repo TEXT NOT NULL, number INTEGER NOT NULL, is_pr INTEGER NOT NULL, state TEXT NOT NULL,
+            title TEXT NOT NULL, body TEXT NOT NULL, user TEXT NOT NULL, labels TEXT NOT NULL,
+            created_at TEXT NOT NULL, updated_at TEXT NOT NULL, html_url TEXT NOT NULL,
+            UNIQUE (repo, number)
+        );
+        CREATE INDEX IF NOT EXISTS issues_by_updated ON issues (repo, updated_at);
+        CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(title, body, content='issues', content_rowid='rowid');
+        CREATE TRIGGER IF NOT EXISTS issues_ai AFTER INSERT ON issues BEGIN
+            INSERT INTO issues_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END;
+        CREATE TRIGGER IF NOT EXISTS issues_au AFTER UPDATE ON issues BEGIN
+            INSERT INTO issues_fts (issues_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+            INSERT INTO issues_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END;
+        CREATE TABLE IF NOT EXISTS sync_state (
+            repo TEXT PRIMARY KEY, watermark TEXT, synced_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def sync_state(self, repo: str):
+        """Retorna (watermark updated_at, timestamp del último sync) o (None, None)"""
+        with self.lock:
+            row = self.conn.execute("SELECT watermark, synced_at FROM sync_state WHERE repo = ?", (repo,)).fetchone()
+        return row or (None, None)
+
+    def upsert(self, repo: str, issues: List[Dict[str, Any]], synced_at: float):
+        with self.lock:
+            watermark = self.conn.execute(
+                "SELECT watermark FROM sync_state WHERE repo = ?", (repo,)
+            ).fetchone()
+            watermark = watermark[0] if watermark else None
+            for issue in issues:
+                self.conn.execute(
+                    "INSERT INTO issues (repo, number, is_pr, state, title, body, user, labels, created_at, updated_at, html_url) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (repo, number) DO UPDATE SET is_pr = excluded.is_pr, state = excluded.state, "
+                    "title = excluded.title, body = excluded.body, user = excluded.user, labels = excluded.labels, "
+                    "updated_at = excluded.updated_at, html_url = excluded.html_url",
+                    (
+                        repo, issue["number"], int("pull_request" in issue), issue["state"],
+                        issue["title"], issue.get("body") or "", issue["user"]["login"],
+                        json.dumps([label["name"] for label in issue.get("labels", [])]),
+                        issue["created_at"], issue["updated_at"], issue["html_url"]
+                    )
+                )
+                watermark = max(watermark or "", issue["updated_at"])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (repo, watermark, synced_at) VALUES (?, ?, ?)",
+                (repo, watermark, synced_at)
+            )
+            self.conn.commit()
+
+    def query(self, repo: str, state: str = "open", labels: List[str] = None, kind: str = "all",
+              text: str = "", limit: int = 30) -> List[Dict[str, Any]]:
+        """Listar o buscar (FTS5) issues/PRs del mirror con la forma de la API REST"""
+        sql = "SELECT issues.number, issues.is_pr, issues.title, issues.user, issues.labels, issues.created_at, issues.html_url FROM issues"
+        conditions = ["issues.repo = ?"]
+        args = [repo]
+        if text:
+            sql += " JOIN issues_fts ON issues_fts.rowid = issues.rowid"
+            conditions.append("issues_fts MATCH ?")
+            # Cada término entre comillas para no interpretar la sintaxis de FTS5
+            args.append(" ".join('"' + term.replace('"', '""') + '"' for term in text.split()))
+        if state != "all":
+            conditions.append("issues.state = ?")
+            args.append(state)
+        if kind != "all":
+            conditions.append("issues.is_pr = ?")
+            args.append(int(kind == "pr"))
+        for label in labels or []:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(issues.labels) WHERE value = ?)")
+            args.append(label)
+        sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY bm25(issues_fts)" if text else " ORDER BY issues.updated_at DESC"
+        sql += " LIMIT ?"
+        args.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, args).fetchall()
+        return [
+            {
+                "number": number, "is_pr": bool(is_pr), "title": title, "user": {"login": user},
+                "labels": [{"name": name} for name in json.loads(labels_json)],
+                "created_at": created_at, "html_url": html_url
+            }
+            for number, is_pr, title, user, labels_json, created_at, html_url in rows
+        ]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class GitHubMCPServer(MCPServer):
+    name = "github-python-mcp-server"
+
+    def __init__(self, session: requests.Session = None):
+        super().__init__()
         self.github_token = os.getenv('GITHUB_TOKEN')
-        self.base_url = "https://api.github.com"
+        # GITHUB_API_URL: GitHub Enterprise o el stub de mcp_bench.py
+        self.base_url = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+        
+        # Cliente HTTP persistente: reutiliza las conexiones TCP+TLS entre llamadas.
+        # En el hub la sesión es compartida, así que los headers van en cada request
+        self.owns_session = session is None
+        self.session = session or http_session(
+            int(os.getenv('GITHUB_POOL_HOSTS', '2')), int(os.getenv('GITHUB_POOL_SIZE', '10'))
+        )
+        self.headers = {
+            'Accept': 'application/vnd.github.v3+json',
+            'User-Agent': 'MCP-GitHub-Server/1.0'
+        }
+        if self.github_token:
+            self.headers['Authorization'] = f'token {self.github_token}'
         
-    def _github_request(self, endpoint: str, method: str = 'GET', data: Dict = None) -> Dict[str, Any]:
-        """Hacer request a GitHub API"""
+        # Planificador según X-RateLimit-*; search va detrás de las lecturas baratas
+        self.rate_limiter = GitHubRateLimiter(
+            max_in_flight=int(os.getenv('GITHUB_MAX_IN_FLIGHT', '6')),
+            reserve=int(os.getenv('GITHUB_RATE_RESERVE', '0'))
+        )
+        # Páginas en threads a la vez: las que esperan turno en el rate limiter no ocupan el executor por defecto
+        self.page_slots = asyncio.Semaphore(self.rate_limiter.max_in_flight)
+        self.max_retries = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+        # GETs idénticos en vuelo comparten un único request a la API
+        self.singleflight = SingleFlight()
+        
+        # Cache en memoria de resultados de herramientas caras (search_code, list_pull_requests)
+        self.result_ttl = float(os.getenv('GITHUB_RESULT_TTL', '60'))
+        self.result_cache = {}
+        
+        # Repositorios por query GraphQL en get_repos_info (acota el costo de cada query)
+        self.graphql_chunk = int(os.getenv('GITHUB_GRAPHQL_CHUNK', '50'))
+        
+        # Cache de GETs condicionales (GITHUB_CACHE_PATH vacío lo desactiva)
+        cache_path = os.getenv('GITHUB_CACHE_PATH', '~/.cache/mcp-servers/github_cache.sqlite')
+        self.cache = GitHubResponseCache(os.path.expanduser(cache_path)) if cache_path else None
+        # Las entradas se separan por token para no mezclar datos de distintos usuarios
+        self.cache_scope = hashlib.sha256((self.github_token or "").encode()).hexdigest()[:16]
+        
+        # Mirror local de issues/PRs, usado cuando el caller pasa max_age (GITHUB_MIRROR_PATH vacío lo desactiva)
+        mirror_path = os.getenv('GITHUB_MIRROR_PATH', '~/.cache/mcp-servers/github_mirror.sqlite')
+        self.mirror = GitHubIssueMirror(os.path.expanduser(mirror_path)) if mirror_path else None
+        self.mirror_locks = {}
+
+    def close(self):
+        """Cerrar las conexiones del pool HTTP (si es propio), el cache y el mirror"""
+        if self.owns_session:
+            self.session.close()
+        if self.cache:
+            self.cache.close()
+        if self.mirror:
+            self.mirror.close()
+
+    def _github_request(self, endpoint: str, method: str = 'GET', data: Dict = None, accept: str = None) -> Dict[str, Any]:
+        """Hacer request a GitHub API; los GET concurrentes idénticos se resuelven con uno solo"""
+        if method == 'GET':
+            try:
+                return self.singleflight.do((accept, endpoint), self._github_request_once, endpoint, method, data, accept)
+            except RequestCancelled:
+                if current_token().cancelled:
+                    raise
+                # Se canceló el request que lideraba la llamada, no este: repetirla
+                return self.singleflight.do((accept, endpoint), self._github_request_once, endpoint, method, data, accept)
+        return self._github_request_once(endpoint, method, data, accept)
+
+    def _github_request_once(self, endpoint: str, method: str = 'GET', data: Dict = None, accept: str = None) -> Dict[str, Any]:
         if not self.github_token:
             return {"error": "GitHub token no configurado en variable GITHUB_TOKEN"}
         
+        if method not in ('GET', 'POST', 'PATCH'):
+            return {"error": f"Método HTTP {method} no soportado"}
+        
         url = f"{self.base_url}/{endpoint}"
-        headers = {
-            'Authorization': f'token {self.github_token}',
-            'Accept': 'application/vnd.github.v3+json',
-            'User-Agent': 'MCP-GitHub-Server/1.0'
-        }
         
-        try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers, timeout=15)
-            elif method == 'POST':
-                response = requests.post(url, headers=headers, json=data, timeout=15)
-            elif method == 'PATCH':
-                response = requests.patch(url, headers=headers, json=data, timeout=15)
+        cache_key = f"{self.cache_scope}:{url}"
+        cached = None
+        headers = dict(self.headers)
+        if accept:
+            # Otro media type es otra representación: entrada de cache propia
+            headers['Accept'] = accept
+            cache_key = f"{self.cache_scope}:{accept}:{url}"
+        if method == 'GET' and self.cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                # GitHub no descuenta del rate limit las respuestas 304
+                self.cache.stats["revalidations"] += 1
+                if cached["headers"].get("ETag"):
+                    headers['If-None-Match'] = cached["headers"]["ETag"]
+                if cached["headers"].get("Last-Modified"):
+                    headers['If-Modified-Since'] = cached["headers"]["Last-Modified"]
             else:
-                return {"error": f"Método HTTP {method} no soportado"}
+                self.cache.stats["misses"] += 1
+        
+        resource = GitHubRateLimiter.resource_for(endpoint)
+        priority = 1 if resource != "core" else 0
+        cancel = current_token()
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                self.rate_limiter.acquire(resource, priority, cancel)
+                response = None
+                try:
+                    response = self.session.request(method, url, json=data, headers=headers, timeout=cancel.timeout(15))
+                finally:
+                    retry = self.rate_limiter.release(resource, response, attempt)
+                if not retry or attempt == self.max_retries:
+                    break
             
+            if response.status_code == 304 and cached:
+                self.cache.stats["hits"] += 1
+                self.cache.touch(cache_key)
+                return {"success": True, "data": cached["data"], "link": cached["headers"].get("Link", "")}
             if response.status_code in [200, 201]:
-                return {"success": True, "data": response.json()}
+                payload = response.json()
+                if method == 'GET' and self.cache:
+                    validators = {k: response.headers[k] for k in ('ETag', 'Last-Modified') if k in response.headers}
+                    if validators:
+                        if 'Link' in response.headers:
+                            validators['Link'] = response.headers['Link']
+                        self.cache.put(cache_key, validators, payload)
+                return {"success": True, "data": payload, "link": response.headers.get('Link', '')}
             else:
                 return {"error": f"GitHub API error: {response.status_code} - {response.text[:200]}"}
+        except RequestCancelled:
+            raise
         except Exception as e:
             return {"error": f"Error conectando a GitHub: {str(e)}"}
 
-    async def initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _parse_link_header(link: str) -> Dict[str, str]:
+        """Parsear el header Link de GitHub a {rel: url}"""
+        links = {}
+        for part in link.split(','):
+            sections = part.split(';')
+            if len(sections) < 2:
+                continue
+            url = sections[0].strip()[1:-1]
+            for attr in sections[1:]:
+                attr = attr.strip()
+                if attr.startswith('rel='):
+                    links[attr[4:].strip('"')] = url
+        return links
+
+    @staticmethod
+    def _page_number(url: str) -> int:
+        query = parse_qs(urlparse(url).query)
+        return int(query.get('page', ['1'])[0])
+
+    async def _github_paginate(self, endpoint: str, max_results: int = None,
+                               on_page: Callable[[List[Any], int, int], None] = None,
+                               accept: str = None) -> Dict[str, Any]:
+        """Recorrer páginas siguiendo Link; conocida rel=last, el resto se pide en paralelo"""
+        separator = '&' if '?' in endpoint else '?'
+        first = await asyncio.to_thread(self._github_request, f"{endpoint}{separator}page=1", 'GET', None, accept)
+        if not first.get("success"):
+            return first
+        
+        def items_of(data: Any) -> List[Any]:
+            return data["items"] if isinstance(data, dict) else data
+        
+        pages = {1: items_of(first["data"])}
+        total_count = first["data"].get("total_count") if isinstance(first["data"], dict) else None
+        per_page = len(pages[1]) or 1
+        links = self._parse_link_header(first["link"])
+        last_page = self._page_number(links["last"]) if "last" in links else 1
+        if max_results is not None:
+            last_page = min(last_page, -(-max_results // per_page))
+        if on_page:
+            on_page(pages[1], 1, last_page)
+        
+        if "last" in links and last_page > 1:
+            # Páginas 2..N concurrentes, a lo sumo GITHUB_MAX_IN_FLIGHT threads a la vez
+            async def fetch(page: int):
+                async with self.page_slots:
+                    return page, await asyncio.to_thread(
+                        self._github_request, f"{endpoint}{separator}page={page}", 'GET', None, accept
+                    )
+            
+            tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, last_page + 1)]
+            for future in asyncio.as_completed(tasks):
+                page, result = await future
+                if not result.get("success"):
+                    for task in tasks:
+                        task.cancel()
+                    return result
+                pages[page] = items_of(result["data"])
+                if on_page:
+                    on_page(pages[page], len(pages), last_page)
+        else:
+            # Sin rel=last solo queda seguir rel=next en serie
+            while "next" in links and (max_results is None or sum(map(len, pages.values())) < max_results):
+                next_endpoint = links["next"][len(self.base_url) + 1:]
+                result = await asyncio.to_thread(self._github_request, next_endpoint, 'GET', None, accept)
+                if not result.get("success"):
+                    return result
+                page = len(pages) + 1
+                pages[page] = items_of(result["data"])
+                if on_page:
+                    on_page(pages[page], page, None)
+                links = self._parse_link_header(result["link"])
+        
+        items = [item for page in sorted(pages) for item in pages[page]]
+        if max_results is not None:
+            items = items[:max_results]
+        return {"success": True, "data": items, "total_count": total_count}
+
+    async def _sync_mirror(self, owner: str, repo: str, max_age: float) -> Dict[str, Any]:
+        """Sincronizar el mirror si es más viejo que max_age, trayendo solo lo actualizado desde el watermark"""
+        full_name = f"{owner}/{repo}"
+        lock = self.mirror_locks.setdefault(full_name, asyncio.Lock())
+        async with lock:
+            watermark, synced_at = await asyncio.to_thread(self.mirror.sync_state, full_name)
+            if synced_at and time.time() - synced_at <= max_age:
+                return {"success": True, "synced": 0}
+            
+            started = time.time()
+            endpoint = f"repos/{full_name}/issues?state=all&sort=updated&direction=asc&per_page=100"
+            if watermark:
+                endpoint += f"&since={watermark}"
+            result = await self._github_paginate(endpoint)
+            if not result.get("success"):
+                return result
+            await asyncio.to_thread(self.mirror.upsert, full_name, result["data"], started)
+            return {"success": True, "synced": len(result["data"])}
+
+    @staticmethod
+    def _format_repo_info(repo_data: Dict[str, Any], fields: List[str] = None) -> str:
+        info = f"📋 Información del repositorio: {repo_data['full_name']}\n\n"
+        for field in fields or REPO_FIELDS:
+            value = repo_data.get(field)
+            if field == "description":
+                value = repo_data.get('description', 'No description')
+            elif field == "language":
+                value = repo_data.get('language', 'N/A')
+            elif field == "size":
+                value = f"{value} KB"
+            elif field == "private":
+                value = 'Yes' if value else 'No'
+            info += f"{REPO_FIELDS[field][1]}: {value}\n"
+        return info
+
+    @staticmethod
+    def _graphql_repo_to_rest(node: Dict[str, Any]) -> Dict[str, Any]:
+        """Llevar un nodo Repository de GraphQL a los nombres de la API REST"""
         return {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {"tools": {"listChanged": False}},
-            "serverInfo": {
-                "name": "github-python-mcp-server",
-                "version": "1.0.0"
-            }
+            "full_name": node["nameWithOwner"],
+            "description": node.get("description"),
+            "html_url": node.get("url"),
+            "stargazers_count": node.get("stargazerCount"),
+            "forks_count": node.get("forkCount"),
+            "watchers_count": node.get("stargazerCount"),
+            "language": (node.get("primaryLanguage") or {}).get("name"),
+            "created_at": node.get("createdAt"),
+            "updated_at": node.get("updatedAt"),
+            "size": node.get("diskUsage"),
+            "private": node.get("isPrivate"),
         }
 
-    async def list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "tools": [
-                {
-                    "name": "search_repositories",
-                    "description": "Buscar repositorios en GitHub",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "query": {"type": "string", "description": "Términos de búsqueda"},
-                            "sort": {"type": "string", "description": "stars, forks, updated (default: stars)"},
-                            "order": {"type": "string", "description": "asc, desc (default: desc)"},
-                            "per_page": {"type": "number", "description": "Resultados por página (default: 10)"}
-                        },
-                        "required": ["query"]
-                    }
-                },
-                {
-                    "name": "get_user_repos",
-                    "description": "Obtener repositorios del usuario autenticado",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "type": {"type": "string", "description": "all, owner, public, private, member (default: owner)"},
-                            "sort": {"type": "string", "description": "created, updated, pushed, full_name (default: updated)"},
-                            "per_page": {"type": "number", "description": "Resultados por página (default: 20)"}
-                        }
-                    }
-                },
-                {
-                    "name": "get_repo_info",
-                    "description": "Obtener información detallada de un repositorio",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "owner": {"type": "string", "description": "Propietario del repositorio"},
-                            "repo": {"type": "string", "description": "Nombre del repositorio"}
-                        },
-                        "required": ["owner", "repo"]
-                    }
-                },
-                {
-                    "name": "list_issues",
-                    "description": "Listar issues de un repositorio",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "owner": {"type": "string", "description": "Propietario del repositorio"},
-                            "repo": {"type": "string", "description": "Nombre del repositorio"},
-                            "state": {"type": "string", "description": "open, closed, all (default: open)"},
-                            "labels": {"type": "string", "description": "Filtrar por labels"},
-                            "per_page": {"type": "number", "description": "Resultados por página (default: 10)"}
-                        },
-                        "required": ["owner", "repo"]
-                    }
-                },
-                {
-                    "name": "create_issue",
-                    "description": "Crear un nuevo issue",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "owner": {"type": "string", "description": "Propietario del repositorio"},
-                            "repo": {"type": "string", "description": "Nombre del repositorio"},
-                            "title": {"type": "string", "description": "Título del issue"},
-                            "body": {"type": "string", "description": "Descripción del issue"},
-                            "labels": {"type": "array", "items": {"type": "string"}, "description": "Labels del issue"}
-                        },
-                        "required": ["owner", "repo", "title"]
-                    }
-                },
-                {
-                    "name": "list_pull_requests",
-                    "description": "Listar pull requests de un repositorio",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "owner": {"type": "string", "description": "Propietario del repositorio"},
-                            "repo": {"type": "string", "description": "Nombre del repositorio"},
-                            "state": {"type": "string", "description": "open, closed, all (default: open)"},
-                            "per_page": {"type": "number", "description": "Resultados por página (default: 10)"}
-                        },
-                        "required": ["owner", "repo"]
-                    }
-                },
-                {
-                    "name": "get_user_info",
-                    "description": "Obtener información del usuario autenticado",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                },
-                {
-                    "name": "search_code",
-                    "description": "Buscar código en repositorios",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {
-                            "query": {"type": "string", "description": "Términos de búsqueda"},
-                            "sort": {"type": "string", "description": "indexed (default)"},
-                            "order": {"type": "string", "description": "asc, desc (default: desc)"},
-                            "per_page": {"type": "number", "description": "Resultados por página (default: 5)"}
-                        },
-                        "required": ["query"]
-                    }
-                }
-            ]
+    async def _graphql_repos(self, repos: List[str], fields: List[str]) -> Dict[str, Any]:
+        """Resolver varios repositorios con queries GraphQL con alias, en chunks paralelos"""
+        selection = " ".join(dict.fromkeys(["nameWithOwner"] + [REPO_FIELDS[field][0] for field in fields]))
+        
+        def build_query(chunk: List[str]) -> Dict[str, Any]:
+            variables = {}
+            declarations = []
+            aliases = []
+            for i, full_name in enumerate(chunk):
+                owner, _, name = full_name.partition("/")
+                variables[f"o{i}"] = owner
+                variables[f"n{i}"] = name
+                declarations.append(f"$o{i}: String!, $n{i}: String!")
+                aliases.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ {selection} }}")
+            return {"query": f"query({', '.join(declarations)}) {{ {' '.join(aliases)} }}", "variables": variables}
+        
+        chunks = [repos[i:i + self.graphql_chunk] for i in range(0, len(repos), self.graphql_chunk)]
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self._github_request, "graphql", "POST", build_query(chunk)) for chunk in chunks
+        ])
+        
+        found = {}
+        for chunk, result in zip(chunks, results):
+            if not result.get("success"):
+                return result
+            # Un repo inexistente llega como NOT_FOUND con su alias en null; otro error (auth,
+            # rate limit, query) invalida la respuesta y no debe mostrarse como "no encontrado"
+            errors = [error for error in result["data"].get("errors") or [] if error.get("type") != "NOT_FOUND"]
+            if errors:
+                return {"error": "GraphQL: " + "; ".join(error.get("message", str(error)) for error in errors)}
+            data = result["data"].get("data") or {}
+            for i, full_name in enumerate(chunk):
+                node = data.get(f"r{i}")
+                found[full_name] = self._graphql_repo_to_rest(node) if node else None
+        return {"success": True, "data": found}
+
+    @staticmethod
+    def _format_search_repo(repo: Dict[str, Any]) -> str:
+        return (
+            f"⭐ {repo['full_name']} ({repo['stargazers_count']} stars)\n"
+            f"   {repo.get('description', 'No description')}\n"
+            f"   🔗 {repo['html_url']}\n"
+        )
+
+    @staticmethod
+    def _format_user_repo(repo: Dict[str, Any]) -> str:
+        status = "🔒" if repo['private'] else "🌐"
+        return (
+            f"{status} {repo['full_name']}\n"
+            f"   {repo.get('description', 'No description')}\n"
+            f"   ⭐ {repo['stargazers_count']} | 🍴 {repo['forks_count']} | {repo['language'] or 'N/A'}\n"
+        )
+
+    @staticmethod
+    def _format_issue(issue: Dict[str, Any]) -> str:
+        labels_str = ", ".join([label["name"] for label in issue.get("labels", [])])
+        return (
+            f"🐛 #{issue['number']} - {issue['title']}\n"
+            f"   👤 {issue['user']['login']} | 📅 {issue['created_at'][:10]}\n"
+            f"   🏷️ {labels_str or 'No labels'}\n"
+            f"   🔗 {issue['html_url']}\n"
+        )
+
+    @staticmethod
+    def _format_pull_request(pr: Dict[str, Any]) -> str:
+        text = (
+            f"🔀 #{pr['number']} - {pr['title']}\n"
+            f"   👤 {pr['user']['login']} | 📅 {pr['created_at'][:10]}\n"
+        )
+        if "head" in pr:
+            text += f"   🌿 {pr['head']['ref']} → {pr['base']['ref']}\n"
+        return text + f"   🔗 {pr['html_url']}\n"
+
+    @staticmethod
+    def _format_code_match(match: Dict[str, Any]) -> str:
+        text = f"📄 {match['repository']['full_name']}: {match['path']}\n   🔗 {match['html_url']}\n"
+        for text_match in match.get("text_matches", []):
+            fragment = "\n".join(f"   │ {line}" for line in text_match["fragment"].splitlines())
+            text += f"{fragment}\n"
+        return text
+
+    @staticmethod
+    def _result_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        """Clave normalizada: minúsculas, espacios colapsados y argumentos ordenados"""
+        normalized = {
+            key: " ".join(value.lower().split()) if isinstance(value, str) else value
+            for key, value in arguments.items()
         }
+        return f"{tool_name}:{json.dumps(normalized, sort_keys=True)}"
 
-    async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
+    def _get_result(self, key: str) -> Dict[str, Any]:
+        entry = self.result_cache.get(key)
+        if entry and entry[0] > time.time():
+            return entry[1]
+        self.result_cache.pop(key, None)
+        return None
+
+    def _store_result(self, key: str, response: Dict[str, Any], max_age: float = None) -> Dict[str, Any]:
+        """Cachear el resultado por GITHUB_RESULT_TTL, o menos si el caller pidió datos con max_age"""
+        ttl = self.result_ttl if max_age is None else min(self.result_ttl, float(max_age))
+        if not response.get("isError") and ttl > 0:
+            if len(self.result_cache) >= 256:
+                # Descartar la entrada más antigua (los dicts mantienen el orden de inserción)
+                self.result_cache.pop(next(iter(self.result_cache)))
+            self.result_cache[key] = (time.time() + ttl, response)
+        return response
+
+    @staticmethod
+    def _page_args(arguments: Dict[str, Any], default_per_page: int):
+        """per_page y max_results efectivos; al recorrer varias páginas se piden de a 100"""
+        if arguments.get("all"):
+            return arguments.get("per_page", 100), None
+        max_results = arguments.get("max_results", arguments.get("per_page", default_per_page))
+        return arguments.get("per_page", min(max(max_results, default_per_page), 100)), max_results
+
+    def _page_notifier(self, params: Dict[str, Any], formatter: Callable[[Dict[str, Any]], str]):
+        """Callback que emite cada página como progreso MCP a medida que llega"""
+        progress_token = params.get("_meta", {}).get("progressToken")
         
-        try:
-            if tool_name == "search_repositories":
-                query = arguments.get("query", "")
-                sort = arguments.get("sort", "stars")
-                order = arguments.get("order", "desc")
-                per_page = arguments.get("per_page", 10)
-                
-                endpoint = f"search/repositories?q={query}&sort={sort}&order={order}&per_page={per_page}"
-                result = self._github_request(endpoint)
-                
-                if result.get("success"):
-                    repos = result["data"]["items"]
-                    repo_list = []
-                    for repo in repos:
-                        repo_list.append(
-                            f"⭐ {repo['full_name']} ({repo['stargazers_count']} stars)\n"
-                            f"   {repo.get('description', 'No description')}\n"
-                            f"   🔗 {repo['html_url']}\n"
-                        )
-                    
-                    return {
-                        "content": [{"type": "text", "text": f"Resultados de búsqueda para '{query}':\n\n" + "\n".join(repo_list)}]
-                    }
-                else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
-                    }
+        def on_page(items: List[Any], done: int, total: int):
+            self._notify_progress(progress_token, done, total, "\n".join(formatter(item) for item in items))
+        
+        return on_page
+
+    @tool({
+        "name": "search_repositories",
+        "description": "Buscar repositorios en GitHub",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Términos de búsqueda"},
+                "sort": {"type": "string", "description": "stars, forks, updated (default: stars)"},
+                "order": {"type": "string", "description": "asc, desc (default: desc)"},
+                "per_page": {"type": "number", "description": "Resultados por página (default: 10)"},
+                "max_results": {"type": "number", "description": "Total de resultados recorriendo páginas (default: per_page)"},
+                "all": {"type": "boolean", "description": "Traer todas las páginas"}
+            },
+            "required": ["query"]
+        }
+    })
+    async def search_repositories(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        query = arguments.get("query", "")
+        sort = arguments.get("sort", "stars")
+        order = arguments.get("order", "desc")
+        per_page, max_results = self._page_args(arguments, 10)
+        
+        endpoint = f"search/repositories?q={query}&sort={sort}&order={order}&per_page={per_page}"
+        result = await self._github_paginate(
+            endpoint, max_results, self._page_notifier(params, self._format_search_repo)
+        )
+        
+        if result.get("success"):
+            repo_list = [self._format_search_repo(repo) for repo in result["data"]]
             
-            elif tool_name == "get_user_repos":
-                repo_type = arguments.get("type", "owner")
-                sort = arguments.get("sort", "updated")
-                per_page = arguments.get("per_page", 20)
-                
-                endpoint = f"user/repos?type={repo_type}&sort={sort}&per_page={per_page}"
-                result = self._github_request(endpoint)
-                
-                if result.get("success"):
-                    repos = result["data"]
-                    repo_list = []
-                    for repo in repos:
-                        status = "🔒" if repo['private'] else "🌐"
-                        repo_list.append(
-                            f"{status} {repo['full_name']}\n"
-                            f"   {repo.get('description', 'No description')}\n"
-                            f"   ⭐ {repo['stargazers_count']} | 🍴 {repo['forks_count']} | {repo['language'] or 'N/A'}\n"
-                        )
-                    
-                    return {
-                        "content": [{"type": "text", "text": f"Tus repositorios ({repo_type}):\n\n" + "\n".join(repo_list)}]
-                    }
-                else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
-                    }
+            return {
+                "content": [{"type": "text", "text": f"Resultados de búsqueda para '{query}':\n\n" + "\n".join(repo_list)}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "get_user_repos",
+        "description": "Obtener repositorios del usuario autenticado",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "type": {"type": "string", "description": "all, owner, public, private, member (default: owner)"},
+                "sort": {"type": "string", "description": "created, updated, pushed, full_name (default: updated)"},
+                "per_page": {"type": "number", "description": "Resultados por página (default: 20)"},
+                "max_results": {"type": "number", "description": "Total de resultados recorriendo páginas (default: per_page)"},
+                "all": {"type": "boolean", "description": "Traer todas las páginas"}
+            }
+        }
+    })
+    async def get_user_repos(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        repo_type = arguments.get("type", "owner")
+        sort = arguments.get("sort", "updated")
+        per_page, max_results = self._page_args(arguments, 20)
+        
+        endpoint = f"user/repos?type={repo_type}&sort={sort}&per_page={per_page}"
+        result = await self._github_paginate(
+            endpoint, max_results, self._page_notifier(params, self._format_user_repo)
+        )
+        
+        if result.get("success"):
+            repo_list = [self._format_user_repo(repo) for repo in result["data"]]
             
-            elif tool_name == "get_repo_info":
-                owner = arguments.get("owner", "")
-                repo = arguments.get("repo", "")
-                
-                endpoint = f"repos/{owner}/{repo}"
-                result = self._github_request(endpoint)
-                
-                if result.get("success"):
-                    repo_data = result["data"]
-                    info = f"📋 Información del repositorio: {repo_data['full_name']}\n\n"
-                    info += f"📝 Descripción: {repo_data.get('description', 'No description')}\n"
-                    info += f"🌐 URL: {repo_data['html_url']}\n"
-                    info += f"⭐ Stars: {repo_data['stargazers_count']}\n"
-                    info += f"🍴 Forks: {repo_data['forks_count']}\n"
-                    info += f"👀 Watchers: {repo_data['watchers_count']}\n"
-                    info += f"📊 Language: {repo_data.get('language', 'N/A')}\n"
-                    info += f"📅 Created: {repo_data['created_at']}\n"
-                    info += f"🔄 Updated: {repo_data['updated_at']}\n"
-                    info += f"📏 Size: {repo_data['size']} KB\n"
-                    info += f"🔒 Private: {'Yes' if repo_data['private'] else 'No'}\n"
-                    
-                    return {
-                        "content": [{"type": "text", "text": info}]
-                    }
-                else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
-                    }
+            return {
+                "content": [{"type": "text", "text": f"Tus repositorios ({repo_type}):\n\n" + "\n".join(repo_list)}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "get_repo_info",
+        "description": "Obtener información detallada de un repositorio",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "owner": {"type": "string", "description": "Propietario del repositorio"},
+                "repo": {"type": "string", "description": "Nombre del repositorio"}
+            },
+            "required": ["owner", "repo"]
+        }
+    })
+    async def get_repo_info(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        owner = arguments.get("owner", "")
+        repo = arguments.get("repo", "")
+        
+        endpoint = f"repos/{owner}/{repo}"
+        result = await asyncio.to_thread(self._github_request, endpoint)
+        
+        if result.get("success"):
+            info = self._format_repo_info(result["data"])
             
-            elif tool_name == "list_issues":
-                owner = arguments.get("owner", "")
-                repo = arguments.get("repo", "")
-                state = arguments.get("state", "open")
-                labels = arguments.get("labels", "")
-                per_page = arguments.get("per_page", 10)
-                
-                endpoint = f"repos/{owner}/{repo}/issues?state={state}&per_page={per_page}"
-                if labels:
-                    endpoint += f"&labels={labels}"
-                
-                result = self._github_request(endpoint)
-                
-                if result.get("success"):
-                    issues = result["data"]
-                    issue_list = []
-                    for issue in issues:
-                        labels_str = ", ".join([label["name"] for label in issue.get("labels", [])])
-                        issue_list.append(
-                            f"🐛 #{issue['number']} - {issue['title']}\n"
-                            f"   👤 {issue['user']['login']} | 📅 {issue['created_at'][:10]}\n"
-                            f"   🏷️ {labels_str or 'No labels'}\n"
-                            f"   🔗 {issue['html_url']}\n"
-                        )
-                    
-                    return {
-                        "content": [{"type": "text", "text": f"Issues de {owner}/{repo} ({state}):\n\n" + "\n".join(issue_list)}]
-                    }
+            return {
+                "content": [{"type": "text", "text": info}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "get_repos_info",
+        "description": "Información de varios repositorios en una sola llamada (GraphQL)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "repos": {"type": "array", "items": {"type": "string"}, "description": "Repositorios como owner/repo"},
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": list(REPO_FIELDS)},
+                    "description": "Campos a incluir (default: todos los de get_repo_info)"
+                }
+            },
+            "required": ["repos"]
+        }
+    })
+    async def get_repos_info(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        repos = arguments.get("repos", [])
+        fields = arguments.get("fields") or list(REPO_FIELDS)
+        unknown = [field for field in fields if field not in REPO_FIELDS]
+        if not repos or unknown:
+            return {
+                "content": [{"type": "text", "text": f"Error: se requiere 'repos' (owner/repo) y campos válidos; desconocidos: {', '.join(unknown) or 'ninguno'}"}],
+                "isError": True
+            }
+        
+        result = await self._graphql_repos(repos, fields)
+        
+        if result.get("success"):
+            blocks = []
+            for full_name, repo_data in result["data"].items():
+                if repo_data is None:
+                    blocks.append(f"❌ {full_name}: no encontrado\n")
                 else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
-                    }
+                    blocks.append(self._format_repo_info(repo_data, fields))
             
-            elif tool_name == "get_user_info":
-                result = self._github_request("user")
-                
-                if result.get("success"):
-                    user = result["data"]
-                    info = f"👤 Información del usuario: {user['login']}\n\n"
-                    info += f"📝 Nombre: {user.get('name', 'N/A')}\n"
-                    info += f"🌐 URL: {user['html_url']}\n"
-                    info += f"📧 Email: {user.get('email', 'N/A')}\n"
-                    info += f"🏢 Company: {user.get('company', 'N/A')}\n"
-                    info += f"📍 Location: {user.get('location', 'N/A')}\n"
-                    info += f"📋 Bio: {user.get('bio', 'N/A')}\n"
-                    info += f"📊 Public repos: {user['public_repos']}\n"
-                    info += f"👥 Followers: {user['followers']}\n"
-                    info += f"👤 Following: {user['following']}\n"
-                    info += f"📅 Created: {user['created_at'][:10]}\n"
-                    
-                    return {
-                        "content": [{"type": "text", "text": info}]
-                    }
-                else:
-                    return {
-                        "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
-                    }
+            return {
+                "content": [{"type": "text", "text": "\n".join(blocks)}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "list_issues",
+        "description": "Listar issues de un repositorio",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "owner": {"type": "string", "description": "Propietario del repositorio"},
+                "repo": {"type": "string", "description": "Nombre del repositorio"},
+                "state": {"type": "string", "description": "open, closed, all (default: open)"},
+                "labels": {"type": "string", "description": "Filtrar por labels"},
+                "max_age": {"type": "number", "description": "Responder desde el mirror local si tiene menos de N segundos"},
+                "per_page": {"type": "number", "description": "Resultados por página (default: 10)"},
+                "max_results": {"type": "number", "description": "Total de resultados recorriendo páginas (default: per_page)"},
+                "all": {"type": "boolean", "description": "Traer todas las páginas"}
+            },
+            "required": ["owner", "repo"]
+        }
+    })
+    async def list_issues(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        owner = arguments.get("owner", "")
+        repo = arguments.get("repo", "")
+        state = arguments.get("state", "open")
+        labels = arguments.get("labels", "")
+        per_page, max_results = self._page_args(arguments, 10)
+        
+        if "max_age" in arguments and self.mirror:
+            # Respuesta local: el mirror solo va a la red si está más viejo que max_age
+            result = await self._sync_mirror(owner, repo, arguments["max_age"])
+            if result.get("success"):
+                issues = await asyncio.to_thread(
+                    self.mirror.query, f"{owner}/{repo}", state,
+                    [label.strip() for label in labels.split(",") if label.strip()],
+                    "all", "", max_results or -1
+                )
+                result = {"success": True, "data": issues}
+        else:
+            endpoint = f"repos/{owner}/{repo}/issues?state={state}&per_page={per_page}"
+            if labels:
+                endpoint += f"&labels={labels}"
             
-            else:
-                return {
-                    "content": [{"type": "text", "text": f"Herramienta '{tool_name}' no encontrada"}],
-                    "isError": True
-                }
-                
-        except Exception as e:
+            result = await self._github_paginate(
+                endpoint, max_results, self._page_notifier(params, self._format_issue)
+            )
+        
+        if result.get("success"):
+            issue_list = [self._format_issue(issue) for issue in result["data"]]
+            
+            return {
+                "content": [{"type": "text", "text": f"Issues de {owner}/{repo} ({state}):\n\n" + "\n".join(issue_list)}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "search_issues",
+        "description": "Buscar issues y pull requests en el mirror local (texto completo en título y cuerpo)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "owner": {"type": "string", "description": "Propietario del repositorio"},
+                "repo": {"type": "string", "description": "Nombre del repositorio"},
+                "query": {"type": "string", "description": "Términos de búsqueda (vacío: todos)"},
+                "state": {"type": "string", "description": "open, closed, all (default: all)"},
+                "type": {"type": "string", "description": "issue, pr, all (default: all)"},
+                "max_age": {"type": "number", "description": "Antigüedad máxima del mirror en segundos (default: 300)"},
+                "limit": {"type": "number", "description": "Máximo de resultados (default: 20)"}
+            },
+            "required": ["owner", "repo"]
+        }
+    })
+    async def search_issues(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        owner = arguments.get("owner", "")
+        repo = arguments.get("repo", "")
+        query = arguments.get("query", "")
+        if not self.mirror:
             return {
-                "content": [{"type": "text", "text": f"Error ejecutando {tool_name}: {str(e)}"}],
+                "content": [{"type": "text", "text": "Mirror local desactivado (GITHUB_MIRROR_PATH vacío)"}],
                 "isError": True
             }
+        
+        result = await self._sync_mirror(owner, repo, arguments.get("max_age", 300))
+        
+        if result.get("success"):
+            issues = await asyncio.to_thread(
+                self.mirror.query, f"{owner}/{repo}", arguments.get("state", "all"), None,
+                arguments.get("type", "all"), query, arguments.get("limit", 20)
+            )
+            issue_list = [self._format_issue(issue) for issue in issues]
+            
+            return {
+                "content": [{"type": "text", "text": f"Búsqueda local en {owner}/{repo} para '{query}':\n\n" + "\n".join(issue_list)}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
 
-    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        method = request.get("method")
-        params = request.get("params", {})
-        request_id = request.get("id")
+    @tool({
+        "name": "create_issue",
+        "description": "Crear un nuevo issue",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "owner": {"type": "string", "description": "Propietario del repositorio"},
+                "repo": {"type": "string", "description": "Nombre del repositorio"},
+                "title": {"type": "string", "description": "Título del issue"},
+                "body": {"type": "string", "description": "Descripción del issue"},
+                "labels": {"type": "array", "items": {"type": "string"}, "description": "Labels del issue"}
+            },
+            "required": ["owner", "repo", "title"]
+        }
+    })
+    async def create_issue(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        owner = arguments.get("owner", "")
+        repo = arguments.get("repo", "")
+        data = {"title": arguments.get("title", "")}
+        if arguments.get("body"):
+            data["body"] = arguments["body"]
+        if arguments.get("labels"):
+            data["labels"] = arguments["labels"]
         
-        try:
-            if method == "initialize":
-                result = await self.initialize(params)
-            elif method == "tools/list":
-                result = await self.list_tools(params)
-            elif method == "tools/call":
-                result = await self.call_tool(params)
-            else:
-                result = {"error": f"Método no soportado: {method}"}
-                
-            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+        result = await asyncio.to_thread(self._github_request, f"repos/{owner}/{repo}/issues", 'POST', data)
+        
+        if result.get("success"):
+            issue = result["data"]
             
-        except Exception as e:
             return {
-                "jsonrpc": "2.0", 
-                "id": request_id,
-                "error": {"code": -32603, "message": str(e)}
+                "content": [{"type": "text", "text": f"✅ Issue #{issue['number']} creado: {issue['html_url']}"}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
             }
 
-    async def run(self):
-        while True:
-            try:
-                line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-                if not line:
-                    break
-                    
-                request = json.loads(line.strip())
-                response = await self.handle_request(request)
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0", "id": None,
-                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
-                }
-                print(json.dumps(error_response), flush=True)
+    @tool({
+        "name": "list_pull_requests",
+        "description": "Listar pull requests de un repositorio",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "owner": {"type": "string", "description": "Propietario del repositorio"},
+                "repo": {"type": "string", "description": "Nombre del repositorio"},
+                "state": {"type": "string", "description": "open, closed, all (default: open)"},
+                "per_page": {"type": "number", "description": "Resultados por página (default: 10)"},
+                "max_results": {"type": "number", "description": "Total de resultados recorriendo páginas (default: per_page)"},
+                "all": {"type": "boolean", "description": "Traer todas las páginas"},
+                "max_age": {"type": "number", "description": "Responder desde el mirror local si tiene menos de N segundos"}
+            },
+            "required": ["owner", "repo"]
+        }
+    })
+    async def list_pull_requests(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        result_key = self._result_key("list_pull_requests", arguments)
+        cached = self._get_result(result_key)
+        if cached:
+            return cached
+        
+        owner = arguments.get("owner", "")
+        repo = arguments.get("repo", "")
+        state = arguments.get("state", "open")
+        per_page, max_results = self._page_args(arguments, 10)
+        
+        if "max_age" in arguments and self.mirror:
+            result = await self._sync_mirror(owner, repo, arguments["max_age"])
+            if result.get("success"):
+                pulls = await asyncio.to_thread(
+                    self.mirror.query, f"{owner}/{repo}", state, None, "pr", "", max_results or -1
+                )
+                result = {"success": True, "data": pulls}
+        else:
+            endpoint = f"repos/{owner}/{repo}/pulls?state={state}&per_page={per_page}"
+            result = await self._github_paginate(
+                endpoint, max_results, self._page_notifier(params, self._format_pull_request)
+            )
+        
+        if result.get("success"):
+            pr_list = [self._format_pull_request(pr) for pr in result["data"]]
+            
+            return self._store_result(result_key, {
+                "content": [{"type": "text", "text": f"Pull requests de {owner}/{repo} ({state}):\n\n" + "\n".join(pr_list)}]
+            }, arguments.get("max_age"))
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "get_user_info",
+        "description": "Obtener información del usuario autenticado",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    })
+    async def get_user_info(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        result = await asyncio.to_thread(self._github_request, "user")
+        
+        if result.get("success"):
+            user = result["data"]
+            info = f"👤 Información del usuario: {user['login']}\n\n"
+            info += f"📝 Nombre: {user.get('name', 'N/A')}\n"
+            info += f"🌐 URL: {user['html_url']}\n"
+            info += f"📧 Email: {user.get('email', 'N/A')}\n"
+            info += f"🏢 Company: {user.get('company', 'N/A')}\n"
+            info += f"📍 Location: {user.get('location', 'N/A')}\n"
+            info += f"📋 Bio: {user.get('bio', 'N/A')}\n"
+            info += f"📊 Public repos: {user['public_repos']}\n"
+            info += f"👥 Followers: {user['followers']}\n"
+            info += f"👤 Following: {user['following']}\n"
+            info += f"📅 Created: {user['created_at'][:10]}\n"
+            
+            return {
+                "content": [{"type": "text", "text": info}]
+            }
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
+
+    @tool({
+        "name": "cache_stats",
+        "description": "Estadísticas del cache de respuestas GitHub (hits, misses, revalidaciones, colapsados)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    })
+    async def cache_stats(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        info = "📦 Cache de GitHub\n\n"
+        if self.cache:
+            stats = self.cache.stats
+            info += f"✅ Hits (304): {stats['hits']}\n"
+            info += f"❌ Misses: {stats['misses']}\n"
+            info += f"🔄 Revalidaciones: {stats['revalidations']}\n"
+        else:
+            info += "Cache desactivado (GITHUB_CACHE_PATH vacío)\n"
+        info += f"🔗 Requests colapsados en vuelo: {self.singleflight.stats['collapsed']} de {self.singleflight.stats['calls']}\n"
+        
+        return {
+            "content": [{"type": "text", "text": info}]
+        }
+
+    @tool({
+        "name": "search_code",
+        "description": "Buscar código en repositorios",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Términos de búsqueda"},
+                "sort": {"type": "string", "description": "indexed (default)"},
+                "order": {"type": "string", "description": "asc, desc (default: desc)"},
+                "per_page": {"type": "number", "description": "Resultados por página (default: 5)"},
+                "max_results": {"type": "number", "description": "Total de resultados recorriendo páginas (default: per_page)"}
+            },
+            "required": ["query"]
+        }
+    })
+    async def search_code(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        result_key = self._result_key("search_code", arguments)
+        cached = self._get_result(result_key)
+        if cached:
+            return cached
+        
+        query = arguments.get("query", "")
+        order = arguments.get("order", "desc")
+        per_page, max_results = self._page_args(arguments, 5)
+        
+        endpoint = f"search/code?q={quote(query)}&order={order}&per_page={per_page}"
+        if arguments.get("sort"):
+            endpoint += f"&sort={arguments['sort']}"
+        # Cada página sale como progreso apenas llega, con sus fragmentos text-match
+        result = await self._github_paginate(
+            endpoint, max_results, self._page_notifier(params, self._format_code_match),
+            accept='application/vnd.github.text-match+json'
+        )
+        
+        if result.get("success"):
+            matches = [self._format_code_match(match) for match in result["data"]]
+            
+            return self._store_result(result_key, {
+                "content": [{"type": "text", "text": f"Código encontrado para '{query}' ({result.get('total_count', 0)} total):\n\n" + "\n".join(matches)}]
+            })
+        else:
+            return {
+                "content": [{"type": "text", "text": f"Error: {result.get('error')}"}]
+            }
 
 if __name__ == "__main__":
-    server = GitHubMCPServer()
-    asyncio.run(server.run())
+    GitHubMCPServer().serve()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Cache de completions de Groq
+LRU en memoria + SQLite en disco, compartido entre el servidor MCP y los comandos de terminal
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+def cache_enabled(temperature: float, requested: bool = None) -> bool:
+    """El cache es opt-in: pedido explícitamente, GROQ_CACHE=1, o temperature 0 (respuesta determinista)"""
+    if requested is not None:
+        return requested
+    if os.getenv('GROQ_CACHE', '').lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return temperature == 0
+
+class GroqCompletionCache:
+    """Cache de completions con tier en memoria (LRU) y tier en disco (SQLite con TTL y tamaño máximo)"""
+
+    def __init__(self, path: str = None, max_memory: int = None, max_entries: int = None, ttl: float = None):
+        path = path or os.getenv('GROQ_CACHE_PATH', '~/.cache/mcp-servers/groq_cache.sqlite')
+        self.path = os.path.expanduser(path)
+        self.max_memory = max_memory or int(os.getenv('GROQ_CACHE_MEMORY', '256'))
+        self.max_entries = max_entries or int(os.getenv('GROQ_CACHE_MAX_ENTRIES', '5000'))
+        self.ttl = ttl or float(os.getenv('GROQ_CACHE_TTL', '86400'))
+        self.memory = OrderedDict()     # key -> (expira, contenido)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(model: str, system: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        payload = json.dumps(
+            {"model": model, "system": system, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _db(self) -> sqlite3.Connection:
+        # Se abre al primer uso: los comandos que no usan cache no tocan el disco
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.conn.commit()
+        return self.conn
+
+    def _remember(self, key: str, expires_at: float, content: str):
+        self.memory[key] = (expires_at, content)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self.memory.pop(key, None)
+
+            db = self._db()
+            row = db.execute(
+                "SELECT content, expires_at FROM completions WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if not row:
+                self.stats["misses"] += 1
+                return None
+            db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._remember(key, row[1], row[0])
+            self.stats["disk_hits"] += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.lock:
+            self._remember(key, expires_at, content)
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, content, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content, expires_at, now)
+            )
+            # Evicción: primero lo vencido, después lo menos usado recientemente
+            db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+            db.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            db.commit()
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Cliente Groq para los comandos de terminal
+Usa el daemon (groq_daemon.py) si está corriendo; si no, llama a Groq directamente
+"""
+
+import json
+import os
+import socket
+import stat
+import time
+from typing import Any, Callable, Dict, List
+from groq_cache import cache_enabled
+
+MODEL = "llama-3.1-8b-instant"
+SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+def daemon_socket_dir() -> str:
+    """$XDG_RUNTIME_DIR (privado del usuario) o un directorio propio 0700 en /tmp que crea el daemon"""
+    return os.getenv('XDG_RUNTIME_DIR') or f"/tmp/mcp-groq-{os.getuid()}"
+
+def daemon_socket_path() -> str:
+    default = os.path.join(daemon_socket_dir(), f"mcp-groq-{os.getuid()}.sock")
+    return os.path.expanduser(os.getenv('GROQ_DAEMON_SOCKET', default))
+
+def owned_socket(path: str) -> bool:
+    """El path es un socket del usuario: otro usuario no puede hacerse pasar por el daemon"""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+def _via_daemon(request: Dict[str, Any], on_delta: Callable[[str], None], timeout: float) -> Dict[str, Any]:
+    """Pedir la completion al daemon; None si no está corriendo"""
+    path = daemon_socket_path()
+    if not owned_socket(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    with sock, sock.makefile('rwb') as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "delta" in message:
+                if on_delta:
+                    on_delta(message["delta"])
+                continue
+            return message
+    return {"error": "El daemon cerró la conexión sin responder"}
+
+def _direct(request: Dict[str, Any], on_delta: Callable[[str], None], timeout: float) -> Dict[str, Any]:
+    """Modo directo: las dependencias pesadas se importan solo acá"""
+    import requests
+    from dotenv import load_dotenv
+    from groq_cache import GroqCompletionCache
+    from groq_stream import groq_url, stream_chat
+
+    load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key:
+        return {"error": f"Configura GROQ_API_KEY en {os.path.join(SCRIPT_DIR, '.env')}"}
+    url = groq_url()
+
+    payload = {
+        "model": MODEL,
+        "messages": request["messages"],
+        "max_tokens": request["max_tokens"],
+        "temperature": request["temperature"]
+    }
+    system = request["messages"][0]["content"] if request["messages"][0]["role"] == "system" else ""
+    cache = cache_key = None
+    if cache_enabled(request["temperature"], request.get("cache")):
+        cache = GroqCompletionCache()
+        cache_key = GroqCompletionCache.make_key(MODEL, system, request["messages"], request["max_tokens"], request["temperature"])
+        content = cache.get(cache_key)
+        if content is not None:
+            return {"content": content, "cached": True}
+
+    if request.get("stream"):
+        parts = []
+        for delta in stream_chat(api_key, url, payload, timeout=timeout):
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+        content = "".join(parts)
+    else:
+        response = requests.post(
+            url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            json=payload,
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            return {"error": f"{response.status_code} - {response.text[:200]}"}
+        content = response.json()["choices"][0]["message"]["content"]
+
+    if cache:
+        cache.put(cache_key, content)
+    return {"content": content, "cached": False}
+
+def complete(messages: List[Dict[str, str]], max_tokens: int, temperature: float, use_cache: bool = None,
+             on_delta: Callable[[str], None] = None, timeout: float = 10) -> Dict[str, Any]:
+    """Completion vía daemon o directa; con on_delta hace streaming
+
+    Retorna {"content", "cached", "duration", "first_token"} o {"error", "duration"}.
+    """
+    start_time = time.time()
+    first_token = []
+
+    def on_chunk(delta: str):
+        if not first_token:
+            first_token.append(time.time() - start_time)
+        on_delta(delta)
+
+    request = {
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "cache": cache_enabled(temperature, use_cache),   # GROQ_CACHE se resuelve del lado del cliente
+        "stream": on_delta is not None
+    }
+    callback = on_chunk if on_delta else None
+    try:
+        result = _via_daemon(request, callback, timeout)
+        if result is None:
+            result = _direct(request, callback, timeout)
+    except Exception as e:
+        result = {"error": str(e)}
+
+    result["duration"] = time.time() - start_time
+    result["first_token"] = first_token[0] if first_token else result["duration"]
+    return result
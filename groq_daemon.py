@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Daemon Groq para los comandos de terminal
+Mantiene caliente el intérprete, la configuración y una conexión keep-alive con api.groq.com
+Uso: ./groq_daemon.py   (los comandos mcpask/mcpcode/mcpgroq/mcpai lo usan si está corriendo)
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict
+from urllib.parse import urlsplit, urlunsplit
+from dotenv import load_dotenv
+from groq_cache import GroqCompletionCache, cache_enabled
+from groq_client import MODEL, SCRIPT_DIR, daemon_socket_dir, daemon_socket_path, owned_socket
+from groq_stream import groq_url, stream_chat
+from singleflight import SingleFlight
+
+load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
+
+class GroqDaemon:
+    def __init__(self):
+        self.api_key = os.getenv('GROQ_API_KEY')
+        self.url = groq_url()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=int(os.getenv('GROQ_POOL_SIZE', '4'))))
+        self.cache = GroqCompletionCache()
+        self.singleflight = SingleFlight()
+
+    def warm_up(self):
+        """Abrir la conexión TLS antes del primer pedido (contra GROQ_API_URL, como los pedidos)"""
+        if self.url.endswith('/chat/completions'):
+            url = self.url[:-len('/chat/completions')] + '/models'
+        else:
+            # Proxy con otra ruta: alcanza con cualquier request al mismo host
+            url = urlunsplit(urlsplit(self.url)[:2] + ('/', '', ''))
+        try:
+            self.session.get(url, timeout=10)
+        except Exception as e:
+            print(f"⚠️  No se pudo precalentar la conexión: {e}", file=sys.stderr)
+
+    def _post(self, payload: Dict[str, Any]) -> str:
+        response = self.session.post(self.url, json=payload, timeout=10)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text[:200]}")
+        return response.json()["choices"][0]["message"]["content"]
+
+    def complete(self, request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """Resolver un pedido de groq_client; en streaming envía cada fragmento con send"""
+        if not self.api_key:
+            return {"error": f"Configura GROQ_API_KEY en {os.path.join(SCRIPT_DIR, '.env')}"}
+
+        messages = request["messages"]
+        payload = {
+            "model": MODEL,
+            "messages": messages,
+            "max_tokens": request["max_tokens"],
+            "temperature": request["temperature"]
+        }
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        cache_key = None
+        if cache_enabled(request["temperature"], request.get("cache")):
+            cache_key = GroqCompletionCache.make_key(MODEL, system, messages, request["max_tokens"], request["temperature"])
+            content = self.cache.get(cache_key)
+            if content is not None:
+                return {"content": content, "cached": True}
+
+        if request.get("stream"):
+            parts = []
+            for delta in stream_chat(self.api_key, self.url, payload, timeout=10, session=self.session):
+                parts.append(delta)
+                send({"delta": delta})
+            content = "".join(parts)
+        else:
+            key = json.dumps(payload, sort_keys=True)
+            content = self.singleflight.do(key, self._post, payload)
+
+        if cache_key:
+            self.cache.put(cache_key, content)
+        return {"content": content, "cached": False}
+
+class GroqDaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        lock = threading.Lock()
+
+        def send(message: Dict[str, Any]):
+            with lock:
+                self.wfile.write(json.dumps(message).encode() + b"\n")
+                self.wfile.flush()
+
+        line = self.rfile.readline()
+        if not line:
+            # Conexión sin pedido (p. ej. otro daemon comprobando si este está vivo)
+            return
+        try:
+            request = json.loads(line)
+            send(self.server.daemon.complete(request, send))
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            send({"error": str(e)})
+
+class GroqDaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+def _private_dir(directory: str):
+    """Crear el directorio del socket solo para el usuario; rechazar uno ajeno o abierto a otros"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        sys.exit(f"❌ {directory} no es un directorio privado del usuario")
+
+def _daemon_running(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(1)
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+def main():
+    path = daemon_socket_path()
+    if not os.getenv('GROQ_DAEMON_SOCKET'):
+        _private_dir(daemon_socket_dir())
+    if os.path.lexists(path):
+        if _daemon_running(path):
+            sys.exit(f"❌ Ya hay un daemon Groq escuchando en {path}")
+        if not owned_socket(path):
+            sys.exit(f"❌ {path} existe y no es un socket del usuario; bórralo a mano si corresponde")
+        # Socket de un daemon que terminó sin limpiar
+        os.unlink(path)
+
+    daemon = GroqDaemon()
+    threading.Thread(target=daemon.warm_up, daemon=True).start()
+
+    old_umask = os.umask(0o077)   # el socket queda accesible solo para el usuario
+    try:
+        server = GroqDaemonServer(path, GroqDaemonHandler)
+    finally:
+        os.umask(old_umask)
+    server.daemon = daemon
+
+    # SIGTERM (kill, systemd, logout) sale por el mismo finally que Ctrl+C y borra el socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"🚀 Daemon Groq escuchando en {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Daemon detenido", file=sys.stderr)
+    finally:
+        server.server_close()
+        daemon.session.close()
+        daemon.cache.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
@@ -5,183 +5,248 @@ Respuestas en 0.5-2 segundos
 """
 
 import asyncio
-import json
 import sys
 import os
+import threading
+import time
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 from dotenv import load_dotenv
+from cancellation import RequestCancelled, current_token
+from groq_cache import GroqCompletionCache, cache_enabled
+from groq_stream import groq_url, stream_chat
+from mcp_runtime import MCPServer, http_session, tool
+from singleflight import SingleFlight
 
 load_dotenv()
 
-class GroqMCPServer:
-    def __init__(self):
+class GroqMCPServer(MCPServer):
+    name = "groq-mcp-fast"
+
+    def __init__(self, session: requests.Session = None):
+        super().__init__()
         self.api_key = os.getenv('GROQ_API_KEY')
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.base_url = groq_url()
         
         # Modelo ultra-rápido
         self.model = "llama-3.1-8b-instant"  # El más rápido de Groq
         
+        # Conexiones persistentes a Groq (en el hub, el pool compartido con GitHub)
+        self.owns_session = session is None
+        self.session = session or http_session(1, int(os.getenv('GROQ_POOL_SIZE', '4')))
+        
+        # Cache de completions compartido con mcpask/mcpcode/mcpgroq/mcpai
+        self.cache = GroqCompletionCache()
+        
+        # Prompts idénticos en vuelo comparten una única llamada a Groq
+        self.singleflight = SingleFlight()
+        
         if not self.api_key:
             print("⚠️  GROQ_API_KEY no encontrada. Obtén una gratis en: https://console.groq.com/", file=sys.stderr)
 
-    def _make_request(self, prompt: str, system: str = "", max_tokens: int = 500) -> str:
-        """Request ultra-rápido a Groq"""
+    def close(self):
+        """Cerrar el pool HTTP (si es propio) y el cache"""
+        if self.owns_session:
+            self.session.close()
+        self.cache.close()
+
+    def _make_request(self, prompt: str, system: str = "", max_tokens: int = 500,
+                      temperature: float = 0.7, use_cache: bool = None,
+                      on_delta: Callable[[str], None] = None) -> str:
+        """Request ultra-rápido a Groq; con on_delta se hace streaming y se reporta cada fragmento"""
+        if on_delta is None:
+            # Sin streaming, los pedidos concurrentes idénticos reciben la misma respuesta
+            key = (GroqCompletionCache.make_key(self.model, system, [{"role": "user", "content": prompt}], max_tokens, temperature), use_cache)
+            try:
+                return self.singleflight.do(key, self._make_request_once, prompt, system, max_tokens, temperature, use_cache)
+            except RequestCancelled:
+                if current_token().cancelled:
+                    raise
+                # Se canceló el request que lideraba la llamada, no este: repetirla
+                return self.singleflight.do(key, self._make_request_once, prompt, system, max_tokens, temperature, use_cache)
+        return self._make_request_once(prompt, system, max_tokens, temperature, use_cache, on_delta)
+
+    def _make_request_once(self, prompt: str, system: str = "", max_tokens: int = 500,
+                           temperature: float = 0.7, use_cache: bool = None,
+                           on_delta: Callable[[str], None] = None) -> str:
         if not self.api_key:
             return "❌ Configura GROQ_API_KEY en .env para usar esta herramienta"
         
+        cancel = current_token()
         try:
             messages = []
             if system:
                 messages.append({"role": "system", "content": system})
             messages.append({"role": "user", "content": prompt})
             
+            cache_key = None
+            if cache_enabled(temperature, use_cache):
+                cache_key = GroqCompletionCache.make_key(self.model, system, messages, max_tokens, temperature)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             data = {
                 "model": self.model,
                 "messages": messages,
                 "max_tokens": max_tokens,
-                "temperature": 0.7,
+                "temperature": temperature,
                 "stream": False
             }
             
-            response = requests.post(
+            if on_delta:
+                parts = []
+                for delta in stream_chat(self.api_key, self.base_url, data, timeout=cancel.timeout(30),
+                                         session=self.session):
+                    # Cancelado: cortar el stream (cerrar el generador cierra la conexión)
+                    cancel.check()
+                    parts.append(delta)
+                    on_delta(delta)
+                content = "".join(parts)
+                if cache_key:
+                    self.cache.put(cache_key, content)
+                return content
+            
+            response = self.session.post(
                 self.base_url,
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
                     "Content-Type": "application/json"
                 },
                 json=data,
-                timeout=10  # Timeout corto porque Groq es súper rápido
+                timeout=cancel.timeout(10)  # Timeout corto porque Groq es súper rápido, acotado por el deadline
             )
             
             if response.status_code == 200:
                 result = response.json()
-                return result["choices"][0]["message"]["content"]
+                content = result["choices"][0]["message"]["content"]
+                if cache_key:
+                    self.cache.put(cache_key, content)
+                return content
             else:
                 return f"❌ Error Groq: {response.status_code} - {response.text}"
                 
+        except RequestCancelled:
+            raise
         except Exception as e:
             return f"❌ Error: {str(e)}"
 
-    async def initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _progress_stream(self, params: Dict[str, Any]):
+        """Callbacks (on_delta, flush) que reenvían el texto parcial como progreso MCP, agrupado cada ~50ms"""
+        progress_token = params.get("_meta", {}).get("progressToken")
+        if progress_token is None:
+            return None, lambda: None
+        
+        loop = asyncio.get_running_loop()
+        state = {"received": 0, "pending": "", "flushed_at": 0.0}
+        # on_delta escribe desde el thread del request y flush vacía desde el event loop
+        lock = threading.Lock()
+        
+        def flush():
+            with lock:
+                pending, received = state["pending"], state["received"]
+                state["pending"] = ""
+            if pending:
+                self._notify_progress(progress_token, received, None, pending)
+        
+        def on_delta(delta: str):
+            # Corre en el thread del request: el envío se agenda en el event loop
+            with lock:
+                state["received"] += len(delta)
+                state["pending"] += delta
+                now = time.monotonic()
+                due = now - state["flushed_at"] >= 0.05
+                if due:
+                    state["flushed_at"] = now
+            if due:
+                loop.call_soon_threadsafe(flush)
+        
+        return on_delta, flush
+
+    async def _complete(self, params: Dict[str, Any], prompt: str, system: str, max_tokens: int) -> Dict[str, Any]:
+        """Completion común a los tools de chat"""
+        arguments = params.get("arguments", {})
+        # Con progressToken se hace streaming y el texto parcial sale como notifications/progress
+        on_delta, flush = self._progress_stream(params)
+        response = await asyncio.to_thread(
+            self._make_request, prompt, system, max_tokens,
+            arguments.get("temperature", 0.7), arguments.get("cache"), on_delta
+        )
+        flush()
+        
         return {
-            "protocolVersion": "2024-11-05",
-            "capabilities": {"tools": {"listChanged": False}},
-            "serverInfo": {
-                "name": "groq-mcp-fast",
-                "version": "1.0.0"
-            }
+            "content": [{"type": "text", "text": response}]
         }
 
-    async def list_tools(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "tools": [
-                {
-                    "name": "fast_chat",
-                    "description": "Chat ultra-rápido con Llama-3.1 via Groq",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {"message": {"type": "string"}},
-                        "required": ["message"]
-                    }
-                },
-                {
-                    "name": "code_help",
-                    "description": "Ayuda de código rápida y precisa",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {"code_query": {"type": "string"}},
-                        "required": ["code_query"]
-                    }
-                },
-                {
-                    "name": "quick_fix",
-                    "description": "Solución rápida a problemas",
-                    "inputSchema": {
-                        "type": "object",
-                        "properties": {"problem": {"type": "string"}},
-                        "required": ["problem"]
-                    }
-                }
-            ]
+    @tool({
+        "name": "fast_chat",
+        "description": "Chat ultra-rápido con Llama-3.1 via Groq",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string"},
+                "temperature": {"type": "number", "description": "Temperatura (default: 0.7; 0 activa el cache)"},
+                "cache": {"type": "boolean", "description": "Usar el cache de respuestas"}
+            },
+            "required": ["message"]
         }
+    })
+    async def fast_chat(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._complete(params, arguments.get("message", ""), "", 500)
 
-    async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
-        
-        try:
-            if tool_name == "fast_chat":
-                message = arguments.get("message", "")
-                response = self._make_request(message)
-                
-            elif tool_name == "code_help":
-                query = arguments.get("code_query", "")
-                system = "Eres un experto programador. Da respuestas concisas con código funcional. Máximo 3 párrafos."
-                response = self._make_request(query, system, max_tokens=800)
-                
-            elif tool_name == "quick_fix":
-                problem = arguments.get("problem", "")
-                system = "Da una solución directa y práctica. Máximo 2 párrafos."
-                response = self._make_request(problem, system, max_tokens=400)
-                
-            else:
-                response = f"Herramienta '{tool_name}' no encontrada"
-                
-            return {
-                "content": [{"type": "text", "text": response}]
-            }
-            
-        except Exception as e:
-            return {
-                "content": [{"type": "text", "text": f"Error: {str(e)}"}],
-                "isError": True
-            }
+    @tool({
+        "name": "code_help",
+        "description": "Ayuda de código rápida y precisa",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "code_query": {"type": "string"},
+                "temperature": {"type": "number", "description": "Temperatura (default: 0.7; 0 activa el cache)"},
+                "cache": {"type": "boolean", "description": "Usar el cache de respuestas"}
+            },
+            "required": ["code_query"]
+        }
+    })
+    async def code_help(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        system = "Eres un experto programador. Da respuestas concisas con código funcional. Máximo 3 párrafos."
+        return await self._complete(params, arguments.get("code_query", ""), system, 800)
 
-    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        method = request.get("method")
-        params = request.get("params", {})
-        request_id = request.get("id")
-        
-        try:
-            if method == "initialize":
-                result = await self.initialize(params)
-            elif method == "tools/list":
-                result = await self.list_tools(params)
-            elif method == "tools/call":
-                result = await self.call_tool(params)
-            else:
-                result = {"error": f"Método no soportado: {method}"}
-                
-            return {"jsonrpc": "2.0", "id": request_id, "result": result}
-            
-        except Exception as e:
-            return {
-                "jsonrpc": "2.0", 
-                "id": request_id,
-                "error": {"code": -32603, "message": str(e)}
-            }
+    @tool({
+        "name": "quick_fix",
+        "description": "Solución rápida a problemas",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "problem": {"type": "string"},
+                "temperature": {"type": "number", "description": "Temperatura (default: 0.7; 0 activa el cache)"},
+                "cache": {"type": "boolean", "description": "Usar el cache de respuestas"}
+            },
+            "required": ["problem"]
+        }
+    })
+    async def quick_fix(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        system = "Da una solución directa y práctica. Máximo 2 párrafos."
+        return await self._complete(params, arguments.get("problem", ""), system, 400)
 
-    async def run(self):
-        while True:
-            try:
-                line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-                if not line:
-                    break
-                    
-                request = json.loads(line.strip())
-                response = await self.handle_request(request)
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError:
-                continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0", "id": None,
-                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
-                }
-                print(json.dumps(error_response), flush=True)
+    @tool({
+        "name": "cache_stats",
+        "description": "Estadísticas del cache de respuestas y de llamadas colapsadas",
+        "inputSchema": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    })
+    async def cache_stats(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        stats = self.cache.stats
+        info = "📦 Cache de Groq\n\n"
+        info += f"⚡ Hits en memoria: {stats['memory_hits']}\n"
+        info += f"💾 Hits en disco: {stats['disk_hits']}\n"
+        info += f"❌ Misses: {stats['misses']}\n"
+        info += f"🔗 Llamadas colapsadas en vuelo: {self.singleflight.stats['collapsed']} de {self.singleflight.stats['calls']}\n"
+        return {
+            "content": [{"type": "text", "text": info}]
+        }
 
 if __name__ == "__main__":
-    server = GroqMCPServer()
-    asyncio.run(server.run())
+    GroqMCPServer().serve()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Streaming de chat completions de Groq (SSE)
+Compartido entre el servidor MCP y los comandos de terminal
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator
+
+import requests
+
+DEFAULT_GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+
+def groq_url() -> str:
+    """GROQ_API_URL (proxy o stub de mcp_bench.py); se lee en cada uso, después de cargar el .env"""
+    return os.getenv('GROQ_API_URL', DEFAULT_GROQ_URL)
+
+
+def iter_sse_deltas(response: requests.Response) -> Iterator[str]:
+    """Parsear el stream SSE de chat completions y generar los fragmentos de texto
+
+    RuntimeError si la conexión se cierra sin [DONE] ni finish_reason: la respuesta quedó
+    cortada y no debe tratarse (ni cachearse) como completa.
+    """
+    # text/event-stream llega sin charset y requests asumiría ISO-8859-1
+    response.encoding = 'utf-8'
+    finished = False
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            finished = True
+            break
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or [{}]
+        if choices[0].get("finish_reason"):
+            finished = True
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+    if not finished:
+        raise RuntimeError("Groq cortó el stream antes de terminar la respuesta")
+
+
+def stream_chat(api_key: str, url: str, payload: Dict[str, Any], timeout: float = 30,
+                session: requests.Session = None) -> Iterator[str]:
+    """POST con stream=True; genera el texto a medida que Groq lo produce"""
+    http = session or requests
+    response = http.post(
+        url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        },
+        json={**payload, "stream": True},
+        stream=True,
+        timeout=timeout
+    )
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Groq respondió {response.status_code} - {response.text[:200]}")
+        yield from iter_sse_deltas(response)
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+Benchmark y prueba de carga de los servidores MCP, sin red
+Stubs locales de api.github.com y api.groq.com, repo git temporal y replay de sesiones JSON-RPC
+
+    ./mcp_bench.py                                  # todos los servidores con las sesiones por defecto
+    ./mcp_bench.py --server github --latency 80 --concurrency 16
+    MCP_RECORD_PATH=/tmp/sesion.jsonl ./git_mcp_server.py   # grabar una sesión real...
+    ./mcp_bench.py --server git --session /tmp/sesion.jsonl # ...y reproducirla
+    ./mcp_bench.py --label despues --compare bench_results/antes.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+from mcp_metrics import is_error_response
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    "git": "git_mcp_server.py",
+    "github": "github_mcp_server.py",
+    "groq": "groq_mcp_fast.py",
+    "hub": "mcp_hub.py",
+}
+
+# Sesiones por defecto: los tools/call que se reproducen en ciclo
+DEFAULT_SESSIONS = {
+    "git": [
+        ("git_status", {}),
+        ("git_log", {"limit": 20}),
+        ("git_log", {"structured": True, "limit": 50}),
+        ("git_show", {"rev": "HEAD~3"}),
+        ("git_diff", {"summary": True}),
+        ("git_grep", {"pattern": "def ", "limit": 50}),
+        ("git_branch", {}),
+    ],
+    "github": [
+        ("search_repositories", {"query": "mcp", "per_page": 10}),
+        ("get_repo_info", {"owner": "octo", "repo": "repo-1"}),
+        ("get_repos_info", {"repos": ["octo/repo-1", "octo/repo-2", "octo/repo-3"]}),
+        ("list_issues", {"owner": "octo", "repo": "repo-1", "max_results": 60}),
+        ("list_pull_requests", {"owner": "octo", "repo": "repo-1"}),
+        ("get_user_info", {}),
+        ("search_code", {"query": "asyncio"}),
+    ],
+    "groq": [
+        ("fast_chat", {"message": "hola"}),
+        ("code_help", {"code_query": "cómo leer un archivo en python"}),
+        ("quick_fix", {"problem": "ModuleNotFoundError: requests"}),
+        ("fast_chat", {"message": "resumí MCP en una línea", "temperature": 0}),
+    ],
+}
+DEFAULT_SESSIONS["hub"] = [
+    (f"{prefix}__{name}", arguments)
+    for prefix in ("git", "github", "groq") for name, arguments in DEFAULT_SESSIONS[prefix]
+]
+
+# ---------------------------------------------------------------------------
+# Upstreams simulados
+# ---------------------------------------------------------------------------
+
+class StubUpstream(ThreadingHTTPServer):
+    """api.github.com y api.groq.com locales, con latencia, errores y rate limit configurables"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, rate_limit: int,
+                 rate_window: float, items: int, tokens: int, token_ms: float, seed: int = 0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.items = items
+        self.tokens = tokens
+        self.token_delay = token_ms / 1000
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.budgets: Dict[str, Tuple[int, float]] = {}   # recurso -> (remaining, reset)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def delay(self):
+        with self.lock:
+            extra = self.random.uniform(0, self.jitter)
+        time.sleep(self.latency + extra)
+
+    def fail(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def take(self, resource: str) -> Tuple[int, float]:
+        """Consumir del budget de rate limit del recurso; retorna (remaining, reset)"""
+        now = time.time()
+        with self.lock:
+            remaining, reset = self.budgets.get(resource, (self.rate_limit, now + self.rate_window))
+            if now >= reset:
+                remaining, reset = self.rate_limit, now + self.rate_window
+            remaining = max(remaining - 1, -1)
+            self.budgets[resource] = (remaining, reset)
+            return remaining, reset
+
+def _repo(i: int) -> Dict[str, Any]:
+    return {
+        "full_name": f"octo/repo-{i}", "description": f"Repositorio de prueba {i}",
+        "html_url": f"https://github.com/octo/repo-{i}", "stargazers_count": 1000 - i, "forks_count": i,
+        "watchers_count": 10 + i, "language": "Python", "private": i % 7 == 0,
+        "created_at": "2024-01-01T00:00:00Z", "updated_at": "2025-01-01T00:00:00Z", "size": 100 + i,
+    }
+
+def _issue(i: int, pull: bool = False) -> Dict[str, Any]:
+    issue = {
+        "number": i, "title": f"{'PR' if pull else 'Issue'} de prueba {i}", "body": "x" * 200,
+        "state": "open", "user": {"login": f"user{i % 5}"}, "labels": [{"name": "bug"}] if i % 3 == 0 else [],
+        "created_at": "2025-01-01T00:00:00Z", "updated_at": f"2025-01-{1 + i % 28:02d}T00:00:00Z",
+        "html_url": f"https://github.com/octo/repo-1/{'pull' if pull else 'issues'}/{i}",
+    }
+    if pull:
+        issue.update(head={"ref": f"feature-{i}"}, base={"ref": "main"})
+    return issue
+
+def _code(i: int) -> Dict[str, Any]:
+    return {
+        "path": f"src/mod{i}.py", "html_url": f"https://github.com/octo/repo-1/blob/main/src/mod{i}.py",
+        "repository": {"full_name": "octo/repo-1"},
+        "text_matches": [{"fragment": f"import asyncio\n\nasync def handler_{i}():\n    pass"}],
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers y body salen en writes separados: sin TCP_NODELAY el ACK retardado suma ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _send(self, status: int, payload: Any = None, headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        stub: StubUpstream = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        url = urlparse(self.path)
+        groq = url.path.endswith("/chat/completions")
+        with stub.lock:
+            stub.calls[f"{self.command} {url.path}"] += 1
+
+        stub.delay()
+        if stub.fail():
+            self._send(502, {"message": "Bad Gateway (simulado)"})
+        elif groq:
+            self._groq(body or {})
+        else:
+            self._github(url, body)
+
+    def _groq(self, body: Dict[str, Any]):
+        stub: StubUpstream = self.server
+        words = [f"palabra{i}" for i in range(stub.tokens)]
+        if not body.get("stream"):
+            text = " ".join(words)
+            self._send(200, {"choices": [{"message": {"role": "assistant", "content": text}}]})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            delta = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}]}
+            self._chunk(f"data: {json.dumps(delta)}\n\n".encode())
+            time.sleep(stub.token_delay)
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _github(self, url, body: Any):
+        stub: StubUpstream = self.server
+        path = url.path.strip("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        resource = "search" if path.startswith("search/") else "graphql" if path == "graphql" else "core"
+
+        remaining, reset = stub.take(resource)
+        headers = {
+            "X-RateLimit-Limit": str(stub.rate_limit), "X-RateLimit-Remaining": str(max(remaining, 0)),
+            "X-RateLimit-Reset": str(int(reset)), "X-RateLimit-Resource": resource,
+        }
+        if remaining < 0:
+            self._send(403, {"message": "API rate limit exceeded (simulado)"}, headers)
+            return
+
+        parts = path.split("/")
+        if path == "graphql":
+            variables = (body or {}).get("variables", {})
+            data = {}
+            for key, owner in variables.items():
+                if key.startswith("o"):
+                    repo = _repo(int(variables[f"n{key[1:]}"].rsplit("-", 1)[-1] or 0))
+                    data[f"r{key[1:]}"] = {
+                        "nameWithOwner": f"{owner}/{variables[f'n{key[1:]}']}", "description": repo["description"],
+                        "url": repo["html_url"], "stargazerCount": repo["stargazers_count"],
+                        "forkCount": repo["forks_count"], "watchers": {"totalCount": repo["watchers_count"]},
+                        "primaryLanguage": {"name": repo["language"]}, "createdAt": repo["created_at"],
+                        "updatedAt": repo["updated_at"], "diskUsage": repo["size"], "isPrivate": repo["private"],
+                    }
+            self._send(200, {"data": data}, headers)
+            return
+        if path == "user":
+            payload = {
+                "login": "octo", "name": "Octo Bench", "html_url": "https://github.com/octo", "email": None,
+                "company": None, "location": None, "bio": None, "public_repos": stub.items,
+                "followers": 1, "following": 1, "created_at": "2020-01-01T00:00:00Z",
+            }
+        elif len(parts) == 3 and parts[0] == "repos":
+            payload = _repo(int(parts[2].rsplit("-", 1)[-1]) if parts[2].rsplit("-", 1)[-1].isdigit() else 0)
+        elif path in ("search/repositories", "user/repos", "search/code") or (
+                len(parts) == 4 and parts[0] == "repos" and parts[3] in ("issues", "pulls")):
+            self._page(url, path, query, parts, headers)
+            return
+        else:
+            self._send(404, {"message": "Not Found"}, headers)
+            return
+        self._send_cacheable(payload, headers)
+
+    def _page(self, url, path: str, query: Dict[str, str], parts: List[str], headers: Dict[str, str]):
+        stub: StubUpstream = self.server
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 30))
+        last = max(1, math.ceil(stub.items / per_page))
+        numbers = range((page - 1) * per_page + 1, min(page * per_page, stub.items) + 1)
+        if path == "search/code":
+            items = [_code(i) for i in numbers]
+        elif path.endswith("issues") or path.endswith("pulls"):
+            items = [_issue(i, pull=path.endswith("pulls")) for i in numbers]
+        else:
+            items = [_repo(i) for i in numbers]
+        payload = {"total_count": stub.items, "items": items} if path.startswith("search/") else items
+
+        def link(number: int, rel: str) -> str:
+            return f'<{stub.url}{url.path}?{urlencode({**query, "page": number})}>; rel="{rel}"'
+        links = ([link(page + 1, "next")] if page < last else []) + [link(last, "last")]
+        self._send_cacheable(payload, {**headers, "Link": ", ".join(links)})
+
+    def _send_cacheable(self, payload: Any, headers: Dict[str, str]):
+        # ETag fijo por contenido: las revalidaciones del cache del servidor reciben 304
+        etag = '"' + hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, None, {**headers, "ETag": etag})
+        else:
+            self._send(200, payload, {**headers, "ETag": etag})
+
+# ---------------------------------------------------------------------------
+# Repositorio git temporal
+# ---------------------------------------------------------------------------
+
+def make_git_fixture(path: str, commits: int, files: int = 20) -> str:
+    """Repo con `commits` commits (vía git fast-import) y cambios sin commitear en el worktree"""
+    subprocess.run(["git", "init", "-q", path], check=True)
+    for key, value in (("user.name", "Bench"), ("user.email", "bench@example.com")):
+        subprocess.run(["git", "-C", path, "config", key, value], check=True)
+    subprocess.run(["git", "-C", path, "symbolic-ref", "HEAD", "refs/heads/main"], check=True)
+
+    stream = []
+    for i in range(commits):
+        module = i % files
+        content = "".join(f"def handler_{module}_{j}(request):\n    return {i + j}\n\n" for j in range(20)).encode()
+        message = f"Cambio {i} en src/mod{module}.py".encode()
+        stream.append(f"commit refs/heads/main\nmark :{i + 1}\n"
+                      f"author Bench <bench@example.com> {1700000000 + i * 60} +0000\n"
+                      f"committer Bench <bench@example.com> {1700000000 + i * 60} +0000\n".encode())
+        stream.append(b"data %d\n%s\n" % (len(message), message))
+        if i:
+            stream.append(b"from :%d\n" % i)
+        stream.append(b"M 100644 inline src/mod%d.py\ndata %d\n%s\n" % (module, len(content), content))
+    subprocess.run(["git", "-C", path, "fast-import", "--quiet"], input=b"".join(stream), check=True)
+    subprocess.run(["git", "-C", path, "reset", "-q", "--hard", "main"], check=True)
+    for name in ("feature-a", "feature-b"):
+        subprocess.run(["git", "-C", path, "branch", name, "main~2"], check=True)
+
+    with open(os.path.join(path, "src", "mod0.py"), "a") as f:
+        f.write("def handler_sin_commitear():\n    return None\n")
+    with open(os.path.join(path, "NOTAS.md"), "w") as f:
+        f.write("archivo sin trackear\n")
+    return path
+
+# ---------------------------------------------------------------------------
+# Generador de carga JSON-RPC
+# ---------------------------------------------------------------------------
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    """Los tools/call de una sesión grabada (MCP_RECORD_PATH), incluidos los de batches"""
+    calls = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            for request in message if isinstance(message, list) else [message]:
+                if isinstance(request, dict) and request.get("method") == "tools/call":
+                    calls.append({"method": "tools/call", "params": request.get("params", {})})
+    return calls
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre valores ordenados"""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def summarize(latencies: List[float], errors: int) -> Dict[str, Any]:
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0, "errors": errors, "mean_ms": 0, "p50_ms": 0, "p95_ms": 0, "p99_ms": 0, "max_ms": 0}
+    return {
+        "count": len(values), "errors": errors,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+async def replay(command: List[str], env: Dict[str, str], cwd: str, calls: List[Dict[str, Any]],
+                 total: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Reproducir `calls` en ciclo contra el servidor por stdio, con `concurrency` requests en vuelo"""
+    process = await asyncio.create_subprocess_exec(
+        *command, cwd=cwd, env=env, limit=64 * 1024 * 1024,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    loop = asyncio.get_running_loop()
+    waiting: Dict[int, asyncio.Future] = {}
+    ids = itertools.count()
+
+    async def read():
+        async for line in process.stdout:
+            message = json.loads(line)
+            for response in message if isinstance(message, list) else [message]:
+                future = waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        for future in waiting.values():
+            if not future.done():
+                future.set_exception(RuntimeError("el servidor terminó antes de responder"))
+
+    async def call(message: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        request_id = next(ids)
+        future = waiting[request_id] = loop.create_future()
+        started = time.perf_counter()
+        process.stdin.write(json.dumps({"jsonrpc": "2.0", "id": request_id, **message}).encode() + b"\n")
+        await process.stdin.drain()
+        response = await future
+        return response, time.perf_counter() - started
+
+    reader = asyncio.create_task(read())
+    latencies = defaultdict(list)
+    errors = Counter()
+    try:
+        await call({"method": "initialize", "params": {
+            "protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "mcp-bench", "version": "1.0.0"}
+        }})
+        process.stdin.write(b'{"jsonrpc":"2.0","method":"notifications/initialized"}\n')
+        for i in range(warmup):
+            await call(calls[i % len(calls)])
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            message = calls[i % len(calls)]
+            async with semaphore:
+                response, elapsed = await call(message)
+            name = message["params"].get("name")
+            latencies[name].append(elapsed)
+            if is_error_response(response):
+                errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - started
+    finally:
+        process.stdin.close()
+        await process.wait()
+        await reader
+
+    every = [latency for values in latencies.values() for latency in values]
+    return {
+        "requests": total, "concurrency": concurrency, "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall > 0 else 0.0,
+        "total": summarize(every, sum(errors.values())),
+        "tools": {name: summarize(values, errors[name]) for name, values in sorted(latencies.items())},
+    }
+
+# ---------------------------------------------------------------------------
+# Reporte y comparación
+# ---------------------------------------------------------------------------
+
+def print_report(name: str, result: Dict[str, Any]):
+    print(f"\n== {name}: {result['requests']} requests, concurrencia {result['concurrency']}, "
+          f"{result['throughput_rps']} req/s, {sum(result['upstream_calls'].values())} llamadas upstream")
+    print(f"{'tool':<32}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for tool_name, stats in list(result["tools"].items()) + [("TOTAL", result["total"])]:
+        print(f"{tool_name:<32}{stats['count']:>6}{stats['errors']:>5}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Imprimir la variación contra una corrida guardada; True si algún p95 empeoró más que threshold %"""
+    regressed = False
+    print(f"\n== Comparación con {baseline.get('label')} ({baseline.get('timestamp')})")
+    print(f"{'servidor/tool':<40}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}")
+
+    def delta(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for server, result in results["servers"].items():
+        before = baseline.get("servers", {}).get(server)
+        if not before:
+            continue
+        rows = [(tool_name, stats, before["tools"].get(tool_name)) for tool_name, stats in result["tools"].items()]
+        rows.append(("TOTAL", result["total"], before["total"]))
+        for tool_name, stats, old in rows:
+            if not old:
+                continue
+            throughput = delta(result["throughput_rps"], before["throughput_rps"]) if tool_name == "TOTAL" else ""
+            worse = old["p95_ms"] and (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 > threshold
+            regressed |= bool(worse)
+            print(f"{server + '/' + tool_name:<40}{delta(stats['p50_ms'], old['p50_ms']):>10}"
+                  f"{delta(stats['p95_ms'], old['p95_ms']):>10}{delta(stats['p99_ms'], old['p99_ms']):>10}"
+                  f"{throughput:>10}{'  ⚠️' if worse else ''}")
+    return regressed
+
+def environment() -> Dict[str, Any]:
+    git = subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+    try:
+        import orjson  # noqa: F401
+        codec = "orjson"
+    except ImportError:
+        codec = "json"
+    return {"python": platform.python_version(), "platform": platform.platform(), "git": git,
+            "json_codec": codec, "cpus": os.cpu_count()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los servidores MCP contra upstreams simulados")
+    parser.add_argument("--server", choices=list(SERVERS) + ["all"], default="all")
+    parser.add_argument("--session", help="Sesión grabada (JSONL) a reproducir en lugar de la sesión por defecto")
+    parser.add_argument("--requests", type=int, default=200, help="tools/call medidos por servidor (default: 200)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests en vuelo (default: 8)")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests previos sin medir (default: 10)")
+    parser.add_argument("--latency", type=float, default=30, help="Latencia base de los upstreams en ms (default: 30)")
+    parser.add_argument("--jitter", type=float, default=10, help="Jitter uniforme agregado en ms (default: 10)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 502 (default: 0)")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Requests por ventana y recurso de GitHub")
+    parser.add_argument("--rate-window", type=float, default=60, help="Duración de la ventana de rate limit en s")
+    parser.add_argument("--items", type=int, default=60, help="Resultados de los listados paginados de GitHub")
+    parser.add_argument("--tokens", type=int, default=40, help="Palabras por completion de Groq")
+    parser.add_argument("--token-ms", type=float, default=1, help="Demora entre fragmentos del streaming de Groq")
+    parser.add_argument("--commits", type=int, default=500, help="Commits del repo git temporal")
+    parser.add_argument("--cold", action="store_true", help="Sin cache de GitHub (ETag, resultados ni mirror)")
+    parser.add_argument("--label", help="Nombre de la corrida (default: fecha y hora)")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_results"), help="Directorio de resultados")
+    parser.add_argument("--compare", help="Resultado guardado contra el que comparar")
+    parser.add_argument("--threshold", type=float, default=10, help="Empeoramiento de p95 (%%) que cuenta como regresión")
+    args = parser.parse_args()
+
+    servers = list(SERVERS) if args.server == "all" else [args.server]
+    if args.session and len(servers) > 1:
+        parser.error("--session requiere elegir un servidor con --server")
+
+    stub = StubUpstream(args.latency, args.jitter, args.error_rate, args.rate_limit, args.rate_window,
+                        args.items, args.tokens, args.token_ms).start()
+    workdir = tempfile.mkdtemp(prefix="mcp-bench-")
+    results = {
+        "label": args.label or time.strftime("%Y%m%d-%H%M%S"),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "label")},
+        "environment": environment(),
+        "servers": {},
+    }
+    try:
+        repo = make_git_fixture(os.path.join(workdir, "repo"), args.commits)
+        for name in servers:
+            calls = load_session(args.session) if args.session else [
+                {"method": "tools/call", "params": {"name": tool_name, "arguments": arguments}}
+                for tool_name, arguments in DEFAULT_SESSIONS[name]
+            ]
+            if not calls:
+                parser.error(f"La sesión {args.session} no tiene tools/call")
+            cache_dir = tempfile.mkdtemp(prefix=f"{name}-", dir=workdir)
+            env = {
+                **os.environ,
+                "GITHUB_API_URL": stub.url,
+                "GROQ_API_URL": f"{stub.url}/openai/v1/chat/completions",
+                "GITHUB_TOKEN": "bench", "GROQ_API_KEY": "bench",
+                "GITHUB_CACHE_PATH": "" if args.cold else os.path.join(cache_dir, "github_cache.sqlite"),
+                "GITHUB_MIRROR_PATH": "" if args.cold else os.path.join(cache_dir, "github_mirror.sqlite"),
+                "GROQ_CACHE_PATH": os.path.join(cache_dir, "groq_cache.sqlite"),
+            }
+            env.pop("MCP_RECORD_PATH", None)
+            if args.cold:
+                env["GITHUB_RESULT_TTL"] = "0"
+            with stub.lock:
+                stub.calls.clear()
+                stub.budgets.clear()
+            command = [sys.executable, os.path.join(ROOT, SERVERS[name])]
+            result = asyncio.run(replay(command, env, repo, calls, args.requests, args.concurrency, args.warmup))
+            result["upstream_calls"] = dict(stub.calls)
+            results["servers"][name] = result
+            print_report(name, result)
+    finally:
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{results['label']}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados en {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Transporte MCP streamable HTTP (respuestas JSON o SSE) para los servidores
+Un proceso caliente atiende a muchos clientes: caches, conexiones y rate limit compartidos
+"""
+
+import asyncio
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from mcp_metrics import render_metrics
+from mcp_runtime import MAX_MESSAGE_BYTES, PARSE_ERROR, MCPServer, MCPSession, json_loads
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+REASONS = {
+    200: "OK", 202: "Accepted", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+    403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+    413: "Payload Too Large",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = "", headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class HTTPSession(MCPSession):
+    def __init__(self, server: MCPServer):
+        super().__init__(server)
+        self.last_seen = time.monotonic()
+
+class MCPHTTPTransport:
+    """Endpoint único (MCP_HTTP_PATH, default /mcp): POST con mensajes, DELETE para cerrar la sesión"""
+
+    def __init__(self, server: MCPServer, host: str, port: int):
+        self.server = server
+        self.host = host
+        self.port = port
+        self.path = os.getenv('MCP_HTTP_PATH', '/mcp')
+        # GET para que Prometheus lea las métricas sin pasar por MCP (vacío = desactivado)
+        self.metrics_path = os.getenv('MCP_HTTP_METRICS_PATH', '/metrics')
+        # Con el servidor expuesto fuera de localhost conviene exigir un token (usa las credenciales del dueño)
+        self.token = os.getenv('MCP_HTTP_TOKEN', '')
+        self.origins = {origin.strip() for origin in os.getenv('MCP_HTTP_ORIGINS', '').split(',') if origin.strip()}
+        # Sesiones sin actividad que se descartan (el cliente puede no mandar DELETE)
+        self.session_ttl = float(os.getenv('MCP_HTTP_SESSION_TTL', '3600'))
+        self.sessions: Dict[str, HTTPSession] = {}
+
+    async def serve(self):
+        listener = await asyncio.start_server(self._client, self.host, self.port, limit=MAX_MESSAGE_BYTES)
+        if self.host not in LOCAL_HOSTS and not self.token:
+            print(f"⚠️  Escuchando en {self.host} sin MCP_HTTP_TOKEN: cualquiera en la red usa tus credenciales",
+                  file=sys.stderr)
+        print(f"🌐 {self.server.name} en http://{self.host}:{self.port}{self.path}", file=sys.stderr)
+        try:
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            for session in self.sessions.values():
+                session.close()
+            await self.server.aclose()
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Una conexión keep-alive: requests HTTP/1.1 en serie"""
+        try:
+            while True:
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    await self._route(method, path, headers, body, writer)
+                except HTTPError as e:
+                    await self._write_response(writer, e.status, e.headers, str(e).encode('utf-8'), "text/plain")
+                    if request is None:
+                        # Request mal formado: no se puede seguir leyendo la conexión
+                        break
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Se requiere Content-Length")
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_MESSAGE_BYTES:
+            raise HTTPError(413, "Mensaje demasiado grande")
+        body = await reader.readexactly(length) if length else b''
+        return method, urlparse(target).path, headers, body
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str],
+                              body: bytes = b'', content_type: str = "application/json"):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}"]
+        if body:
+            lines.append(f"Content-Type: {content_type}")
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    def _check_access(self, headers: Dict[str, str]):
+        # Protección contra DNS rebinding: un navegador manda Origin, los clientes MCP no
+        origin = headers.get('origin')
+        if origin and origin not in self.origins and urlparse(origin).hostname not in LOCAL_HOSTS:
+            raise HTTPError(403, "Origin no permitido")
+        if self.token:
+            scheme, _, credentials = headers.get('authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not hmac.compare_digest(credentials.encode(), self.token.encode()):
+                raise HTTPError(401, "Token inválido", {"WWW-Authenticate": "Bearer"})
+
+    def _session(self, headers: Dict[str, str]) -> HTTPSession:
+        session_id = headers.get('mcp-session-id')
+        if not session_id:
+            raise HTTPError(400, "Falta el header Mcp-Session-Id")
+        session = self.sessions.get(session_id)
+        if session is None:
+            # 404: el cliente debe volver a inicializar
+            raise HTTPError(404, "Sesión inexistente o expirada")
+        session.last_seen = time.monotonic()
+        return session
+
+    def _new_session(self) -> Tuple[str, HTTPSession]:
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.last_seen > self.session_ttl and not session.in_flight:
+                del self.sessions[session_id]
+        session_id = secrets.token_hex(16)
+        self.sessions[session_id] = HTTPSession(self.server)
+        return session_id, self.sessions[session_id]
+
+    async def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes,
+                     writer: asyncio.StreamWriter):
+        if method == 'GET' and self.metrics_path and path == self.metrics_path:
+            self._check_access(headers)
+            await self._write_response(writer, 200, {}, render_metrics().encode('utf-8'),
+                                       "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if path != self.path:
+            raise HTTPError(404, "No encontrado")
+        self._check_access(headers)
+
+        if method == 'DELETE':
+            session_id = headers.get('mcp-session-id', '')
+            self._session(headers).close()
+            del self.sessions[session_id]
+            await self._write_response(writer, 204, {})
+            return
+        if method != 'POST':
+            # Sin stream GET: el servidor no inicia mensajes fuera de un request
+            raise HTTPError(405, "Método no permitido", {"Allow": "POST, DELETE"})
+
+        try:
+            message = json_loads(body)
+        except ValueError:
+            await self._write_response(writer, 400, {}, PARSE_ERROR)
+            return
+
+        response_headers = {}
+        if isinstance(message, dict) and message.get("method") == "initialize":
+            session_id, session = self._new_session()
+            response_headers["Mcp-Session-Id"] = session_id
+        else:
+            session = self._session(headers)
+
+        if 'text/event-stream' in headers.get('accept', ''):
+            await self._reply_sse(session, message, writer, response_headers)
+            return
+        # Cliente solo JSON: una respuesta al final, sin notificaciones de progreso
+        awaitable = session.handle(message, lambda data: None)
+        if awaitable is None:
+            await self._write_response(writer, 202, response_headers)
+            return
+        data = await awaitable
+        if data is None:
+            await self._write_response(writer, 202, response_headers)
+        else:
+            await self._write_response(writer, 200, response_headers, data)
+
+    async def _reply_sse(self, session: HTTPSession, message: Any, writer: asyncio.StreamWriter,
+                         response_headers: Dict[str, str]):
+        """Stream SSE del POST: el progreso de sus requests y al final la respuesta"""
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        started = []
+        finished = []
+
+        def start():
+            lines = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                     "Transfer-Encoding: chunked"]
+            lines += [f"{name}: {value}" for name, value in response_headers.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+            started.append(True)
+
+        def event(data: bytes):
+            if finished or writer.is_closing():
+                # Stream ya cerrado, o el cliente se fue: el request sigue (desconectarse no es cancelar)
+                return
+            if not started:
+                start()
+            chunk = b"event: message\ndata: " + data + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+
+        def sink(data: bytes):
+            # El progreso de Groq y de los requests a GitHub llega desde threads
+            if threading.get_ident() == loop_thread:
+                event(data)
+            else:
+                loop.call_soon_threadsafe(event, data)
+
+        awaitable = session.handle(message, sink)
+        if awaitable is None:
+            await self._write_response(writer, 202, response_headers)
+            return
+        data = await awaitable
+        if data is not None:
+            event(data)
+        elif not started and not writer.is_closing():
+            # Request cancelado: stream vacío
+            start()
+        finished.append(True)
+        if not writer.is_closing():
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+
+async def serve_http(server: MCPServer, host: str, port: int):
+    await MCPHTTPTransport(server, host, port).serve()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Hub MCP: los tools de Git, GitHub y Groq en un único proceso
+Un solo arranque de Python, un pool HTTP compartido y caches calientes entre llamadas
+"""
+
+import os
+from typing import Any, Dict
+from dotenv import load_dotenv
+from git_mcp_server import GitMCPServer
+from github_mcp_server import GitHubMCPServer
+from groq_mcp_fast import GroqMCPServer
+from mcp_runtime import MCPServer, ToolHandler, http_session
+
+load_dotenv()
+
+class MCPHub(MCPServer):
+    """Expone los tools de cada servidor como <servidor>__<tool> (ej. github__search_code)"""
+
+    name = "mcp-hub"
+
+    def __init__(self):
+        super().__init__()
+        # Un pool por host: api.github.com (y sus redirecciones) más api.groq.com
+        self.session = http_session(
+            int(os.getenv('GITHUB_POOL_HOSTS', '2')) + 1, int(os.getenv('GITHUB_POOL_SIZE', '10'))
+        )
+        self.servers = {
+            "git": GitMCPServer(),
+            "github": GitHubMCPServer(session=self.session),
+            "groq": GroqMCPServer(session=self.session),
+        }
+        for prefix, server in self.servers.items():
+            # Las notificaciones de progreso salen por el transporte del hub
+            server._send = self._send
+            for spec in server.tool_specs:
+                if spec["name"] == "metrics":
+                    # Las métricas son del proceso: alcanza con el metrics del hub
+                    continue
+                self.add_tool({**spec, "name": f"{prefix}__{spec['name']}"}, self._route(server, spec["name"]))
+
+    @staticmethod
+    def _route(server: MCPServer, tool_name: str) -> ToolHandler:
+        async def handler(arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+            return await server.call_tool({**params, "name": tool_name})
+        return handler
+
+    def close(self):
+        for server in self.servers.values():
+            server.close()
+        self.session.close()
+
+    async def aclose(self):
+        for server in self.servers.values():
+            await server.aclose()
+        # En modo HTTP el pool compartido se libera acá (close() lo repite sin efecto)
+        self.session.close()
+
+if __name__ == "__main__":
+    MCPHub().serve()
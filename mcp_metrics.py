@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Métricas de los servidores MCP en formato Prometheus
+Latencia por tool y por upstream (connect, TLS, primer byte y total), errores, requests en vuelo y tamaños
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+INF_BUCKET = 'le="+Inf"'
+
+class Metric:
+    """Una familia de series (counter, gauge o histogram) indexadas por los valores de sus labels"""
+
+    def __init__(self, name: str, kind: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # counter/gauge: [valor]; histogram: [conteo por bucket..., suma, total]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+        # Se actualizan desde el event loop y desde los threads de los requests HTTP
+        self.lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self.lock:
+            series = self.series.setdefault(labels, [0])
+            series[0] += amount
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            series = sorted((labels, list(values)) for labels, values in self.series.items())
+        for labels, values in series:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels)]
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_labels(pairs)} {_number(values[0])}")
+                continue
+            for bound, count in zip(self.buckets, values):
+                bucket = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(pairs + [bucket])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(pairs + [INF_BUCKET])} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {values[-1]}")
+        return lines
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs: List[str]) -> str:
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def add(self, name: str, kind: str, help_text: str, labels: Tuple[str, ...],
+            buckets: Tuple[float, ...] = ()) -> Metric:
+        metric = Metric(name, kind, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Exposición en texto de Prometheus (version 0.0.4)"""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+# Un registro por proceso: en mcp_hub.py lo comparten los tres servidores
+REGISTRY = MetricsRegistry()
+
+TOOL_CALLS = REGISTRY.add("mcp_tool_calls_total", "counter", "tools/call terminados por resultado",
+                          ("server", "tool", "outcome"))
+TOOL_DURATION = REGISTRY.add("mcp_tool_duration_seconds", "histogram", "Duración de los tools/call",
+                             ("server", "tool"), LATENCY_BUCKETS)
+TOOL_IN_FLIGHT = REGISTRY.add("mcp_tool_in_flight", "gauge", "tools/call en curso (incluye los que esperan turno)",
+                              ("server", "tool"))
+TOOL_REQUEST_BYTES = REGISTRY.add("mcp_tool_request_bytes", "histogram", "Tamaño de los argumentos en JSON",
+                                  ("server", "tool"), SIZE_BUCKETS)
+TOOL_RESPONSE_BYTES = REGISTRY.add("mcp_tool_response_bytes", "histogram", "Tamaño de la respuesta JSON-RPC",
+                                   ("server", "tool"), SIZE_BUCKETS)
+
+UPSTREAM_REQUESTS = REGISTRY.add("mcp_upstream_requests_total", "counter",
+                                 "Requests HTTP a las APIs por status (error = sin respuesta)",
+                                 ("upstream", "method", "status"))
+UPSTREAM_IN_FLIGHT = REGISTRY.add("mcp_upstream_in_flight", "gauge", "Requests HTTP en curso", ("upstream",))
+UPSTREAM_CONNECT = REGISTRY.add("mcp_upstream_connect_seconds", "histogram", "Conexión TCP de conexiones nuevas",
+                                ("upstream",), LATENCY_BUCKETS)
+UPSTREAM_TLS = REGISTRY.add("mcp_upstream_tls_seconds", "histogram", "Handshake TLS de conexiones nuevas",
+                            ("upstream",), LATENCY_BUCKETS)
+UPSTREAM_TTFB = REGISTRY.add("mcp_upstream_ttfb_seconds", "histogram",
+                             "Desde el inicio del request hasta los headers de la respuesta", ("upstream",),
+                             LATENCY_BUCKETS)
+UPSTREAM_DURATION = REGISTRY.add("mcp_upstream_duration_seconds", "histogram",
+                                 "Request completo, incluido el body (o el stream hasta cerrarlo)", ("upstream",),
+                                 LATENCY_BUCKETS)
+UPSTREAM_RESPONSE_BYTES = REGISTRY.add("mcp_upstream_response_bytes", "histogram", "Bytes recibidos por request",
+                                       ("upstream",), SIZE_BUCKETS)
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+def is_error_response(response: Dict[str, Any]) -> bool:
+    """Error JSON-RPC, isError, o el texto "Error..."/"❌..." con el que responden muchos tools"""
+    if "error" in response:
+        return True
+    result = response.get("result") or {}
+    if result.get("isError"):
+        return True
+    text = next((item.get("text", "") for item in result.get("content") or [] if isinstance(item, dict)), "")
+    return text.startswith(("Error", "❌"))
+
+# ---------------------------------------------------------------------------
+# Log estructurado: una línea JSON por tools/call (MCP_METRICS_LOG=ruta, o - para stderr)
+# ---------------------------------------------------------------------------
+
+_log_lock = threading.Lock()
+_log_file = None
+
+def _log(entry: Dict[str, Any]):
+    global _log_file
+    target = os.getenv('MCP_METRICS_LOG')
+    if not target:
+        return
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with _log_lock:
+        if target == '-':
+            # stdout es el canal del protocolo
+            sys.stderr.write(line)
+            return
+        if _log_file is None:
+            _log_file = open(os.path.expanduser(target), 'a', buffering=1)
+        _log_file.write(line)
+
+# Duraciones de los requests HTTP del tools/call en curso; las threads de asyncio.to_thread heredan la lista
+_call_upstream: contextvars.ContextVar = contextvars.ContextVar('mcp_call_upstream', default=None)
+
+class ToolCall:
+    """Medición de un tools/call: se crea al despacharlo y se cierra con finish()"""
+
+    def __init__(self, server: str, tool: str, request_id: Any, request_bytes: int):
+        self.labels = (server, tool)
+        self.request_id = request_id
+        self.request_bytes = request_bytes
+        self.upstream: List[float] = []
+        _call_upstream.set(self.upstream)
+        TOOL_IN_FLIGHT.inc(self.labels)
+        TOOL_REQUEST_BYTES.observe(self.labels, request_bytes)
+        self.started = time.perf_counter()
+
+    def finish(self, outcome: str, response_bytes: int = 0):
+        """outcome: ok, error, timeout o cancelled"""
+        elapsed = time.perf_counter() - self.started
+        TOOL_IN_FLIGHT.inc(self.labels, -1)
+        TOOL_CALLS.inc(self.labels + (outcome,))
+        TOOL_DURATION.observe(self.labels, elapsed)
+        if response_bytes:
+            TOOL_RESPONSE_BYTES.observe(self.labels, response_bytes)
+        now = time.time()
+        _log({
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{int(now * 1000) % 1000:03d}Z",
+            "server": self.labels[0], "tool": self.labels[1], "id": self.request_id, "outcome": outcome,
+            "duration_ms": round(elapsed * 1000, 3), "request_bytes": self.request_bytes,
+            "response_bytes": response_bytes, "upstream_calls": len(self.upstream),
+            "upstream_ms": round(sum(self.upstream) * 1000, 3),
+        })
+
+# ---------------------------------------------------------------------------
+# Cliente HTTP instrumentado
+# ---------------------------------------------------------------------------
+
+# Fases del request en curso en este thread (requests resuelve cada request en un solo thread)
+_timing = threading.local()
+
+def _phase(name: str, value: float):
+    timing = getattr(_timing, "current", None)
+    if timing is not None:
+        timing[name] = value
+
+class _TimedConnection:
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _phase("connect", time.perf_counter() - started)
+        return sock
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        timing = getattr(_timing, "current", None)
+        if timing is not None and isinstance(self, HTTPSConnection):
+            timing["tls"] = time.perf_counter() - started - timing.get("connect", 0)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        timing = getattr(_timing, "current", None)
+        if timing is not None:
+            timing["ttfb"] = time.perf_counter() - timing["start"]
+        return response
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter cuyas conexiones miden connect y TLS al abrirse y el primer byte de cada respuesta"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool,
+                                                   "https": TimedHTTPSConnectionPool}
+
+class InstrumentedSession(requests.Session):
+    """requests.Session que registra cada request en las métricas mcp_upstream_*"""
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        upstream = urlparse(request.url).netloc
+        previous = getattr(_timing, "current", None)
+        timing = _timing.current = {"start": time.perf_counter()}
+        calls = _call_upstream.get()
+        UPSTREAM_IN_FLIGHT.inc((upstream,))
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            _record(upstream, request.method, "error", timing, None, calls)
+            raise
+        finally:
+            _timing.current = previous
+
+        if not kwargs.get("stream"):
+            _record(upstream, request.method, str(response.status_code), timing, response, calls)
+            return response
+        # Streaming: el total se mide hasta que el caller cierra la respuesta
+        close = response.close
+        recorded = []
+
+        def close_and_record():
+            close()
+            if not recorded:
+                recorded.append(True)
+                _record(upstream, request.method, str(response.status_code), timing, response, calls)
+        response.close = close_and_record
+        return response
+
+def _record(upstream: str, method: str, status: str, timing: Dict[str, float],
+            response: Optional[requests.Response], calls: Optional[List[float]]):
+    total = time.perf_counter() - timing["start"]
+    labels = (upstream,)
+    UPSTREAM_IN_FLIGHT.inc(labels, -1)
+    UPSTREAM_REQUESTS.inc((upstream, method, status))
+    UPSTREAM_DURATION.observe(labels, total)
+    if "connect" in timing:
+        UPSTREAM_CONNECT.observe(labels, timing["connect"])
+    if "tls" in timing:
+        UPSTREAM_TLS.observe(labels, timing["tls"])
+    if "ttfb" in timing:
+        UPSTREAM_TTFB.observe(labels, timing["ttfb"])
+    if response is not None and hasattr(response.raw, "tell"):
+        # Bytes leídos del socket (sin descomprimir)
+        UPSTREAM_RESPONSE_BYTES.observe(labels, response.raw.tell())
+    if calls is not None:
+        calls.append(total)
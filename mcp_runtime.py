@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Runtime MCP compartido por los servidores Git, GitHub y Groq
+Protocolo JSON-RPC por stdio, registro de tools y loop con deadlines y cancelación
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import stat
+import sys
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import requests
+from cancellation import CancelToken, request_timeout, set_current_token
+from mcp_metrics import InstrumentedAdapter, InstrumentedSession, ToolCall, is_error_response, render_metrics
+
+try:
+    # Opcional: codec JSON más rápido (pip install orjson)
+    import orjson
+except ImportError:
+    orjson = None
+
+ToolHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# Tamaño máximo de un mensaje JSON-RPC entrante (una línea)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+PROTOCOL_VERSIONS = ("2024-11-05", "2025-03-26")
+
+PARSE_ERROR = b'{"jsonrpc":"2.0","id":null,"error":{"code":-32700,"message":"Parse error"}}'
+
+# Destino de los mensajes del request en curso (stdio o el stream SSE de su POST)
+_current_sink: contextvars.ContextVar = contextvars.ContextVar('mcp_sink', default=None)
+
+def json_dumps(obj: Any) -> bytes:
+    """Serializar a JSON compacto en UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def tool(spec: Dict[str, Any]):
+    """Decorador: registra el método como tool MCP con su schema (name, description, inputSchema)"""
+    def decorate(method):
+        method.mcp_tool = spec
+        return method
+    return decorate
+
+def http_session(pool_hosts: int, pool_size: int) -> requests.Session:
+    """Cliente HTTP persistente: reutiliza las conexiones TCP+TLS entre llamadas y mide cada request"""
+    session = InstrumentedSession()
+    # pool_maxsize es el límite de conexiones por host; pool_block lo hace estricto
+    adapter = InstrumentedAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    # http:// solo para APIs locales (GITHUB_API_URL/GROQ_API_URL), con el mismo pool
+    session.mount('http://', adapter)
+    return session
+
+def _is_pipe(stream) -> bool:
+    """Los transportes de pipe de asyncio ponen el fd en no bloqueante: solo para pipes y sockets"""
+    try:
+        mode = os.fstat(stream.fileno()).st_mode
+    except (OSError, ValueError):
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)
+
+class StdioTransport:
+    """stdin/stdout como streams asyncio; lo escrito en una vuelta del loop sale en un solo write"""
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.pending: List[bytes] = []
+        self.scheduled = False
+        # write() también se llama desde threads (progreso de requests bloqueantes)
+        self.lock = threading.Lock()
+
+    async def open(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.get_ident()
+        if _is_pipe(sys.stdin):
+            self.reader = asyncio.StreamReader(limit=MAX_MESSAGE_BYTES)
+            await self.loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(self.reader), sys.stdin)
+        if _is_pipe(sys.stdout):
+            transport, protocol = await self.loop.connect_write_pipe(
+                lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), sys.stdout
+            )
+            self.writer = asyncio.StreamWriter(transport, protocol, None, self.loop)
+
+    async def readline(self) -> bytes:
+        """Próxima línea de stdin (b"" en EOF)"""
+        if self.reader is None:
+            # stdin es una terminal o un archivo: lectura bloqueante en un thread
+            return await self.loop.run_in_executor(None, sys.stdin.buffer.readline)
+        try:
+            return await self.reader.readline()
+        except ValueError:
+            # Línea más larga que MAX_MESSAGE_BYTES: se descarta y se responde como JSON inválido
+            return b"{\n"
+
+    def write(self, line: bytes):
+        """Encolar una línea; se escribe junto con las demás al final de la vuelta del loop"""
+        with self.lock:
+            self.pending.append(line)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        if threading.get_ident() == self.thread:
+            self.loop.call_soon(self.flush)
+        else:
+            self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        with self.lock:
+            lines, self.pending = self.pending, []
+            self.scheduled = False
+        if not lines:
+            return
+        data = b"".join(lines)
+        if self.writer is not None:
+            self.writer.write(data)
+        else:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+    async def close(self):
+        self.flush()
+        if self.writer is not None:
+            await self.writer.drain()
+            self.writer.close()
+
+class MCPServer:
+    """Base de los servidores: los tools se registran con @tool y se despachan por nombre"""
+
+    name = "python-mcp-server"
+    version = "1.0.0"
+
+    def __init__(self):
+        # Máximo de tools/call ejecutándose a la vez
+        self.max_concurrency = int(os.getenv('MCP_MAX_CONCURRENCY', '8'))
+        self.tools: Dict[str, ToolHandler] = {}
+        self.tool_specs: List[Dict[str, Any]] = []
+        self._tools_json = None
+        self.transport: Optional[StdioTransport] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        # En orden de definición, para que tools/list respete el orden del código
+        for cls in reversed(type(self).__mro__):
+            for attribute, member in vars(cls).items():
+                spec = getattr(member, "mcp_tool", None)
+                if spec is not None:
+                    self.add_tool(spec, getattr(self, attribute))
+        # Spec propio de cada instancia: los servidores pueden ajustar los schemas de sus tools
+        self.add_tool({
+            "name": "metrics",
+            "description": "Métricas del servidor en formato Prometheus: latencia por tool y por API, errores, requests en vuelo y tamaños",
+            "inputSchema": {"type": "object", "properties": {}}
+        }, self.metrics)
+
+    def add_tool(self, spec: Dict[str, Any], handler: ToolHandler):
+        self.tools[spec["name"]] = handler
+        self.tool_specs.append(spec)
+        self._tools_json = None
+
+    def tools_json(self) -> bytes:
+        """Resultado de tools/list serializado una sola vez"""
+        if self._tools_json is None:
+            self._tools_json = json_dumps({"tools": self.tool_specs})
+        return self._tools_json
+
+    def close(self):
+        """Liberar recursos del servidor (pools, caches)"""
+
+    async def aclose(self):
+        """Liberar recursos que viven en el event loop (procesos hijos)"""
+
+    async def metrics(self, arguments: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Tool metrics: el registro del proceso en texto Prometheus"""
+        return {"content": [{"type": "text", "text": render_metrics()}]}
+
+    async def initialize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # El transporte HTTP es de la revisión 2025-03-26; stdio funciona con ambas
+        requested = params.get("protocolVersion")
+        return {
+            "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {
+                "name": self.name,
+                "version": self.version
+            }
+        }
+
+    async def call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        tool_name = params.get("name")
+        arguments = params.get("arguments", {})
+
+        handler = self.tools.get(tool_name)
+        if handler is None:
+            return {
+                "content": [{"type": "text", "text": f"Herramienta '{tool_name}' no encontrada"}],
+                "isError": True
+            }
+        try:
+            return await handler(arguments, params)
+        except Exception as e:
+            return {
+                "content": [{"type": "text", "text": f"Error ejecutando {tool_name}: {str(e)}"}],
+                "isError": True
+            }
+
+    async def handle_request(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        method = request.get("method")
+        params = request.get("params", {})
+        request_id = request.get("id")
+
+        try:
+            if method == "initialize":
+                result = await self.initialize(params)
+            elif method == "tools/list":
+                # Respuesta armada sobre el JSON ya serializado de los schemas
+                return b'{"jsonrpc":"2.0","id":' + json_dumps(request_id) + b',"result":' + self.tools_json() + b'}'
+            elif method == "tools/call":
+                result = await self.call_tool(params)
+            else:
+                result = {"error": f"Método no soportado: {method}"}
+
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+        except Exception as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32603, "message": str(e)}
+            }
+
+    def _send(self, response: Union[Dict[str, Any], bytes]):
+        """Enviar un mensaje JSON-RPC al cliente del request en curso (dict o JSON ya serializado)"""
+        data = response if isinstance(response, bytes) else json_dumps(response)
+        sink = _current_sink.get()
+        if sink is not None:
+            sink(data)
+        elif self.transport is not None:
+            self.transport.write(data + b"\n")
+        else:
+            sys.stdout.buffer.write(data + b"\n")
+            sys.stdout.buffer.flush()
+
+    def _notify_progress(self, progress_token: Any, progress: int, total: int = None, message: str = ""):
+        """Enviar notifications/progress si el cliente pidió progreso"""
+        if progress_token is None:
+            return
+        params = {"progressToken": progress_token, "progress": progress}
+        if total is not None:
+            params["total"] = total
+        if message:
+            params["message"] = message
+        self._send({"jsonrpc": "2.0", "method": "notifications/progress", "params": params})
+
+    async def run(self):
+        """Loop principal por stdio: cada tools/call corre como su propia task, con deadline y cancelable"""
+        self.transport = StdioTransport()
+        await self.transport.open()
+        session = MCPSession(self)
+        pending = set()  # respuestas todavía en curso
+        # Grabar la sesión para reproducirla con mcp_bench.py --session
+        record_path = os.getenv('MCP_RECORD_PATH')
+        record = open(os.path.expanduser(record_path), 'ab') if record_path else None
+
+        def write(data: bytes):
+            self.transport.write(data + b"\n")
+
+        async def reply(awaitable: Awaitable[Optional[bytes]]):
+            data = await awaitable
+            if data is not None:
+                write(data)
+
+        while True:
+            try:
+                line = await self.transport.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                if record:
+                    record.write(line if line.endswith(b"\n") else line + b"\n")
+
+                try:
+                    message = json_loads(line)
+                except ValueError:
+                    write(PARSE_ERROR)
+                    continue
+
+                awaitable = session.handle(message, write)
+                if awaitable is None:
+                    continue
+                if isinstance(message, dict) and message.get("method") != "tools/call":
+                    # initialize y tools/list son inmediatos: se responden en orden
+                    await reply(awaitable)
+                else:
+                    # La respuesta se escribe al terminar, correlacionada por id
+                    task = asyncio.create_task(reply(awaitable))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+            except Exception as e:
+                error_response = {
+                    "jsonrpc": "2.0", "id": None,
+                    "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
+                }
+                write(json_dumps(error_response))
+
+        # EOF en stdin: terminar las llamadas pendientes antes de salir
+        if pending:
+            await asyncio.gather(*list(pending), return_exceptions=True)
+        if record:
+            record.close()
+        await self.aclose()
+        await self.transport.close()
+
+    def serve(self):
+        """Correr el servidor por stdio hasta EOF, o por HTTP con --http [HOST:]PORT"""
+        parser = argparse.ArgumentParser(description=f"Servidor MCP {self.name}")
+        parser.add_argument('--http', metavar='[HOST:]PORT',
+                            help="Servir MCP streamable HTTP en vez de stdio (HOST por defecto: 127.0.0.1)")
+        args = parser.parse_args()
+        try:
+            if args.http:
+                from mcp_http import serve_http
+                host, _, port = args.http.rpartition(':')
+                asyncio.run(serve_http(self, host or '127.0.0.1', int(port)))
+            else:
+                asyncio.run(self.run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+class MCPSession:
+    """Un cliente conectado: sus requests en vuelo, para correlacionar notifications/cancelled"""
+
+    def __init__(self, server: MCPServer):
+        self.server = server
+        self.in_flight: Dict[Any, Tuple[asyncio.Task, CancelToken]] = {}
+        if server.semaphore is None:
+            # Compartido por todas las sesiones del servidor
+            server.semaphore = asyncio.Semaphore(server.max_concurrency)
+
+    async def _dispatch(self, request: Dict[str, Any], cancel: CancelToken, sink: Callable[[bytes], None]):
+        # Las threads lanzadas desde esta task heredan el token y el destino del progreso por contextvar
+        set_current_token(cancel)
+        _current_sink.set(sink)
+        params = request.get("params", {})
+        tool_name = params.get("name")
+        # Nombres desconocidos agrupados: el cliente no controla la cardinalidad de las métricas
+        call = ToolCall(self.server.name, tool_name if tool_name in self.server.tools else "desconocido",
+                        request.get("id"), len(json_dumps(params.get("arguments", {}))))
+
+        async def handle():
+            async with self.server.semaphore:
+                return await self.server.handle_request(request)
+
+        outcome = "cancelled"
+        data = b""
+        try:
+            try:
+                response = await asyncio.wait_for(handle(), cancel.remaining())
+                outcome = "error" if is_error_response(response) else "ok"
+            except asyncio.TimeoutError:
+                cancel.cancel("deadline excedido")
+                outcome = "timeout"
+                response = {
+                    "jsonrpc": "2.0", "id": request.get("id"),
+                    "error": {"code": -32001, "message": "Deadline excedido"}
+                }
+            data = json_dumps(response)
+            return data
+        finally:
+            call.finish(outcome, len(data))
+
+    @staticmethod
+    async def _answer(task: asyncio.Task):
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # notifications/cancelled: MCP indica no responder
+            return None
+
+    def submit(self, request: Any, sink: Callable[[bytes], None]) -> Optional[Awaitable]:
+        """Iniciar un mensaje; retorna el awaitable de su respuesta (None si no lleva respuesta)"""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return asyncio.sleep(0, {
+                "jsonrpc": "2.0", "id": None,
+                "error": {"code": -32600, "message": "Invalid Request"}
+            })
+        if request["method"] == "notifications/cancelled":
+            entry = self.in_flight.get(request.get("params", {}).get("requestId"))
+            if entry:
+                task, cancel = entry
+                cancel.cancel(request["params"].get("reason") or "cancelado por el cliente")
+                task.cancel()
+            return None
+        if "id" not in request:
+            # Notificación (ej. notifications/initialized): sin respuesta
+            return None
+        if request["method"] == "tools/call":
+            request_id = request["id"]
+            try:
+                cancel = CancelToken(request_timeout(request.get("params", {})))
+            except ValueError as e:
+                return asyncio.sleep(0, {
+                    "jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": -32602, "message": f"Invalid params: {e}"}
+                })
+            task = asyncio.create_task(self._dispatch(request, cancel, sink))
+            self.in_flight[request_id] = (task, cancel)
+            task.add_done_callback(lambda _, request_id=request_id: self.in_flight.pop(request_id, None))
+            return self._answer(task)
+        return self.server.handle_request(request)
+
+    def handle(self, message: Any, sink: Callable[[bytes], None]) -> Optional[Awaitable[Optional[bytes]]]:
+        """Iniciar un mensaje o un batch; retorna el awaitable de la respuesta serializada (None si no lleva)"""
+        if isinstance(message, list):
+            awaitables = [awaitable for awaitable in (self.submit(request, sink) for request in message)
+                          if awaitable is not None]
+            if not message:
+                awaitables = [self.submit(None, sink)]
+            return self._collect(awaitables, batch=bool(message)) if awaitables else None
+        awaitable = self.submit(message, sink)
+        return None if awaitable is None else self._collect([awaitable], batch=False)
+
+    @staticmethod
+    async def _collect(awaitables: List[Awaitable], batch: bool) -> Optional[bytes]:
+        responses = [response for response in await asyncio.gather(*awaitables) if response is not None]
+        if not responses:
+            return None
+        encoded = [response if isinstance(response, bytes) else json_dumps(response) for response in responses]
+        # Un batch se responde con un único array, sin las notificaciones
+        return b"[" + b",".join(encoded) + b"]" if batch else encoded[0]
+
+    def close(self):
+        """Cancelar lo que quede en vuelo (sesión terminada por el cliente)"""
+        for task, cancel in list(self.in_flight.values()):
+            cancel.cancel("sesión terminada")
+            task.cancel()
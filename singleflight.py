@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Singleflight: coalescing de llamadas idénticas en vuelo
+Compartido por los servidores GitHub y Groq
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+from cancellation import current_token
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """La primera llamada con una clave ejecuta; las concurrentes con la misma clave esperan y reciben su resultado"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, _Call] = {}
+        self.stats = {"calls": 0, "collapsed": 0}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self.lock:
+            self.stats["calls"] += 1
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.stats["collapsed"] += 1
+
+        if not leader:
+            # En tramos cortos: un seguidor cancelado o con el deadline vencido no espera al líder
+            token = current_token()
+            while not call.done.wait(min(0.1, token.remaining() or 0.1)):
+                token.check()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Se quita antes de despertar: una llamada posterior ya no se suma a esta
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result